@@ -0,0 +1,56 @@
+import os
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from .schemas import ForecastVersion
+
+# Forecasts only change when a prediction run commits (hourly), so let clients
+# and intermediate caches reuse a response for a short while and revalidate after.
+FORECAST_CACHE_MAX_AGE = int(os.getenv("FORECAST_CACHE_MAX_AGE", "60"))
+
+
+def forecast_etag(store, version: ForecastVersion, variant: str) -> str:
+    """Strong ETag for one representation of a store's forecasts.
+
+    variant covers everything else that changes the body (filters, page, format).
+    """
+    key = f"{store}|{version.model_version}|{version.run_id}|{variant}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def _http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def cache_headers(etag: str, version: ForecastVersion) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": _http_date(version.last_modified),
+        "Cache-Control": f"public, max-age={FORECAST_CACHE_MAX_AGE}",
+        # The body format is negotiated from Accept, so shared caches must key on it
+        "Vary": "Accept",
+    }
+
+
+def is_not_modified(headers, etag: str, version: ForecastVersion) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no If-None-Match is sent"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in tags
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        last_modified = version.last_modified
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
@@ -1,8 +1,16 @@
 
-from fastapi import APIRouter, HTTPException, Depends
-from .schemas import DemandForecastRequest, DemandForecastResponse
-from .service import _get_demand_forecast
+import hmac
+from datetime import datetime, date
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query, Header
+from .schemas import (DemandForecastRequest, DemandForecastResponse, ForecastFilter,
+                      BatchForecastRequest, BatchDemandForecastResponse)
+from .service import (_get_demand_forecast, _get_forecast_columns, decode_cursor,
+                      _get_batch_demand_forecast, _get_batch_forecast_columns,
+                      _map_restaurant_id, _get_forecast_version)
+from . import responses, caching
 from .db import get_db_session
+from ml_pipeline.config import Config
 
 
 router = APIRouter(prefix="/ai")
@@ -13,6 +21,26 @@ def health_check():
     return {"status": "ok", "service": "Restaurant AI Demand Forecasting"}
 
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints only exist when ADMIN_TOKEN is set, and need it in X-Admin-Token"""
+    if not Config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), Config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.post("/admin/profiling", dependencies=[Depends(require_admin)])
+def arm_pipeline_profiling(request: Request, runs: int = Query(1, ge=1, le=10)):
+    """Profile the next `runs` training/prediction pipeline runs (CPU samples and
+    per-stage memory peaks, written under PROFILE_DIR and to MLflow for training).
+    Requires the X-Admin-Token header; disabled unless ADMIN_TOKEN is set."""
+    orchestrator = getattr(request.app.state, "orchestrator", None)
+    if orchestrator is None:
+        raise HTTPException(status_code=503, detail="ML pipeline orchestrator is not running")
+    orchestrator.profiler.arm(runs)
+    return {"status": "armed", "runs": orchestrator.profiler.armed_runs}
+
+
 @router.post("/demandforecast/predict", response_model=DemandForecastResponse)
 def predict_demand_endpoint(data: DemandForecastRequest) -> DemandForecastResponse:
     """
@@ -31,17 +59,105 @@ def predict_demand_endpoint(data: DemandForecastRequest) -> DemandForecastRespon
 
 
 @router.get("/demandforecast/predict", response_model=DemandForecastResponse)
-def get_demand_forecast(restaurant_id: str, db_session = Depends(get_db_session)) -> DemandForecastResponse:
-    """Get latest demand forecasts for all items in a restaurant
+def get_demand_forecast(
+    restaurant_id: str,
+    request: Request,
+    response: Response,
+    item_ids: Optional[List[int]] = Query(None),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    horizon: Optional[int] = Query(None, ge=1),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    db_session = Depends(get_db_session),
+) -> DemandForecastResponse:
+    """Get latest demand forecasts for items in a restaurant, ordered by forecast date and item.
+    Served from the memory-mapped forecast store when the restaurant is in the
+    latest published run, otherwise from the forecasts table. Responses carry an
+    ETag and Last-Modified for the served run and honour If-None-Match and
+    If-Modified-Since with 304 Not Modified.
     Args:
         restaurant_id : Restaurant ID in Orders Table
+        item_ids : Only return these items (repeat the parameter for several)
+        start_date, end_date : Inclusive forecast date range
+        horizon : Number of days from start_date (or tomorrow) to return
+        limit : Page size; pass the returned next_cursor as cursor for the next page
+        format : model (default), json, columnar or ndjson. Can also be chosen
+            with Accept: application/vnd.forecast.columnar+json or application/x-ndjson
 
     Returns:
         DemandForecastObject
     """
     try:
+        fmt = responses.negotiate_format(response_format, accept)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filters = ForecastFilter(item_ids=item_ids, start_date=start_date, end_date=end_date,
+                             horizon=horizon, limit=limit, cursor=cursor)
 
-        return _get_demand_forecast(db_session, restaurant_id)
+    try:
+        forecast_store = getattr(request.app.state, "forecast_store", None)
+        store = _map_restaurant_id(restaurant_id)
+
+        # Conditional GET: the body only changes when a new prediction run is served
+        headers = {}
+        version = _get_forecast_version(db_session, store, forecast_store)
+        if version is not None:
+            variant = f"{fmt}|{request.url.query}"
+            if horizon is not None and start_date is None:
+                variant += f"|{date.today()}"  # horizon counts from tomorrow
+            etag = caching.forecast_etag(store, version, variant)
+            headers = caching.cache_headers(etag, version)
+            if caching.is_not_modified(request.headers, etag, version):
+                return Response(status_code=304, headers=headers)
+
+        if fmt == responses.MODEL:
+            response.headers.update(headers)
+            return _get_demand_forecast(db_session, store, forecast_store, filters)
+
+        restaurant_id, columns, next_cursor = _get_forecast_columns(db_session, store, forecast_store, filters)
+        if fmt == responses.NDJSON:
+            result = responses.ndjson_response(restaurant_id, columns, next_cursor)
+        elif fmt == responses.COLUMNAR:
+            result = responses.columnar_response(restaurant_id, columns, datetime.now(), next_cursor)
+        else:
+            result = responses.fast_json_response(restaurant_id, columns, datetime.now(), next_cursor)
+        result.headers.update(headers)
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"failed to get forecasts with error {e}")
 
+
+@router.post("/demandforecast/predict/batch", response_model=BatchDemandForecastResponse)
+def get_batch_demand_forecast(
+    data: BatchForecastRequest,
+    request: Request,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    db_session = Depends(get_db_session),
+) -> BatchDemandForecastResponse:
+    """Get latest demand forecasts for many restaurants in one call, grouped per restaurant.
+
+    - **restaurant_ids**: Restaurant IDs in Orders Table
+    - **item_ids**, **start_date**, **end_date**, **horizon**: Same filters as the single restaurant read
+    - **format**: model (default), json, columnar or ndjson (one restaurant per line, streamed)
+    """
+    try:
+        fmt = responses.negotiate_format(response_format, accept)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filters = ForecastFilter(**data.model_dump(exclude={"restaurant_ids"}))
+
+    try:
+        forecast_store = getattr(request.app.state, "forecast_store", None)
+        if fmt == responses.MODEL:
+            return _get_batch_demand_forecast(db_session, data.restaurant_ids, forecast_store, filters)
+
+        results = _get_batch_forecast_columns(db_session, data.restaurant_ids, forecast_store, filters)
+        return responses.batch_response(results, fmt, datetime.now())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"failed to get batch forecasts with error {e}")
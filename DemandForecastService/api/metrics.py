@@ -0,0 +1,31 @@
+import time
+from fastapi import APIRouter, Request
+from fastapi.responses import PlainTextResponse
+from ml_pipeline.instrumentation import REGISTRY, HTTP_REQUEST_DURATION
+
+# Served at the root (/metrics) where Prometheus scrapes by default. Metrics are
+# per process, so with several uvicorn workers each worker reports its own.
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+async def record_request_latency(request: Request, call_next):
+    """HTTP middleware recording request latency per route template"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
@@ -26,4 +26,14 @@ class PredictionResults(base):
     yhat = Column(Float)
     yhat_lower = Column(Float)
     yhat_upper = Column(Float)
-    model_version = Column(String)
\ No newline at end of file
+    model_version = Column(String)
+
+
+class ForecastRun(base):
+    """Runs of each store in forecasts; only rows of the store's "current" run are served"""
+    __tablename__ = "forecast_runs"
+    store = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, primary_key=True)
+    row_count = Column(Integer)
+    model_version = Column(String(100))
+    status = Column(String(16), nullable=False, index=True)
\ No newline at end of file
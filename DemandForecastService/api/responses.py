@@ -0,0 +1,139 @@
+import json
+from datetime import datetime
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback, slower but same output
+    orjson = None
+
+
+# Response modes for forecast reads. "model" is the DemandForecastResponse schema
+# validated by FastAPI, the others bypass per-row pydantic models entirely.
+MODEL = "model"
+FAST_JSON = "json"
+COLUMNAR = "columnar"
+NDJSON = "ndjson"
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.forecast.columnar+json"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+ACCEPT_FORMATS = {
+    COLUMNAR_MEDIA_TYPE: COLUMNAR,
+    NDJSON_MEDIA_TYPE: NDJSON,
+    "application/ndjson": NDJSON,
+}
+FORMATS = {MODEL, FAST_JSON, COLUMNAR, NDJSON}
+
+
+def negotiate_format(requested, accept):
+    """Pick the response mode from the format query parameter or the Accept header"""
+    if requested:
+        requested = requested.lower()
+        if requested not in FORMATS:
+            raise ValueError(f"Unknown format '{requested}', expected one of {sorted(FORMATS)}")
+        return requested
+    for media_type in (accept or "").split(","):
+        fmt = ACCEPT_FORMATS.get(media_type.split(";")[0].strip())
+        if fmt:
+            return fmt
+    return MODEL
+
+
+def _default(obj):
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+def _predictions(columns):
+    return [
+        {"item_id": item_id, "forecast_date": forecast_date,
+         "predicted_demand": predicted_demand, "yhat_lower": yhat_lower}
+        for item_id, forecast_date, predicted_demand, yhat_lower in _rows(columns)
+    ]
+
+
+def _rows(columns):
+    return zip(columns["item_id"], columns["forecast_date"],
+               columns["predicted_demand"], columns["yhat_lower"])
+
+
+def fast_json_response(restaurant_id, columns, generated_at: datetime, next_cursor=None) -> Response:
+    """Same payload as DemandForecastResponse, serialized straight from the columns"""
+    body = {
+        "restaurant_id": restaurant_id,
+        "total_items_forecasted": len(columns["item_id"]),
+        "predictions": _predictions(columns),
+        "generated_at": generated_at,
+        "next_cursor": next_cursor,
+    }
+    return Response(dumps(body), media_type="application/json")
+
+
+def columnar_response(restaurant_id, columns, generated_at: datetime, next_cursor=None) -> Response:
+    """Parallel arrays, one per forecast field"""
+    body = {
+        "restaurant_id": restaurant_id,
+        "total_items_forecasted": len(columns["item_id"]),
+        "columns": columns,
+        "generated_at": generated_at,
+        "next_cursor": next_cursor,
+    }
+    return Response(dumps(body), media_type=COLUMNAR_MEDIA_TYPE)
+
+
+def ndjson_response(restaurant_id, columns, next_cursor=None, chunk_size=1000) -> StreamingResponse:
+    """One JSON object per forecast row, streamed in chunks. The next page cursor,
+    if any, is sent in the X-Next-Cursor header."""
+    def generate():
+        lines = []
+        for item_id, forecast_date, predicted_demand, yhat_lower in _rows(columns):
+            lines.append(dumps({"item_id": item_id, "forecast_date": forecast_date,
+                                "predicted_demand": predicted_demand, "yhat_lower": yhat_lower}))
+            if len(lines) == chunk_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+    headers = {"X-Restaurant-Id": restaurant_id}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+
+def batch_response(results, fmt, generated_at: datetime) -> Response:
+    """Serialize (restaurant_id, columns) pairs from a batch read.
+
+    json and columnar return one document grouped per restaurant, ndjson
+    streams one restaurant per line as soon as it is serialized.
+    """
+    def restaurant(restaurant_id, columns):
+        body = {"restaurant_id": restaurant_id, "total_items_forecasted": len(columns["item_id"])}
+        if fmt == COLUMNAR:
+            body["columns"] = columns
+        else:
+            body["predictions"] = _predictions(columns)
+        body["generated_at"] = generated_at
+        return body
+
+    if fmt == NDJSON:
+        def generate():
+            for restaurant_id, columns in results:
+                yield dumps(restaurant(restaurant_id, columns)) + b"\n"
+        return StreamingResponse(generate(), media_type=NDJSON_MEDIA_TYPE)
+
+    body = {
+        "total_restaurants": len(results),
+        "results": [restaurant(restaurant_id, columns) for restaurant_id, columns in results],
+        "generated_at": generated_at,
+    }
+    return Response(dumps(body), media_type=COLUMNAR_MEDIA_TYPE if fmt == COLUMNAR else "application/json")
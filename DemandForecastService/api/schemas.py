@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Union, Any
 from datetime import datetime, date
 
@@ -24,9 +24,39 @@ class DemandForecastRequest(BaseModel):
     start_date: Optional[date] = None  # Start date for forecast, defaults to tomorrow
 
 
+class ForecastFilter(BaseModel):
+    item_ids: Optional[List[int]] = None  # Only these items, all items if None
+    start_date: Optional[date] = None  # First forecast date to return (inclusive)
+    end_date: Optional[date] = None  # Last forecast date to return (inclusive)
+    horizon: Optional[int] = None  # Number of days from start_date (or tomorrow)
+    limit: Optional[int] = None  # Page size, all rows if None
+    cursor: Optional[str] = None  # next_cursor of the previous page
+
+
+class ForecastVersion(BaseModel):
+    run_id: str  # Prediction run that produced the served forecasts
+    model_version: Optional[str] = None
+    last_modified: datetime  # UTC time the run was committed
+
+
 class DemandForecastResponse(BaseModel):
     restaurant_id: str
     # forecast_period: Dict[str, Union[str, int]]  # start_date, end_date
     total_items_forecasted: int
     predictions: List[Forecast]
-    generated_at: datetime
\ No newline at end of file
+    generated_at: datetime
+    next_cursor: Optional[str] = None  # Set when more pages are available
+
+
+class BatchForecastRequest(BaseModel):
+    restaurant_ids: List[str]
+    item_ids: Optional[List[int]] = None  # Only these items, all items if None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    horizon: Optional[int] = Field(None, ge=1)  # Number of days from start_date (or tomorrow)
+
+
+class BatchDemandForecastResponse(BaseModel):
+    total_restaurants: int
+    results: List[DemandForecastResponse]
+    generated_at: datetime
@@ -1,38 +1,269 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_
 import structlog
 import random
-from .models import PredictionResults as Preds
-from datetime import datetime
-from .schemas import DemandForecastResponse, Forecast
+import base64
+from itertools import groupby
+from operator import itemgetter
+import numpy as np
+from .models import PredictionResults as Preds, ForecastRun as Runs
+from datetime import datetime, date, timedelta
+from typing import Optional
+from .schemas import DemandForecastResponse, Forecast, ForecastFilter, BatchDemandForecastResponse, ForecastVersion
 
 LOG = structlog.stdlib.get_logger()
 
+# forecast_runs status of the run served for a store (see ml_pipeline.forecast_table)
+CURRENT_RUN = "current"
 
-def _get_demand_forecast(session: Session, restaurant_id) -> DemandForecastResponse:
+
+def _map_restaurant_id(restaurant_id) -> int:
     LOG.info(f"Getting forecasts for restaurant{restaurant_id}....")
-    restaurant_id = random.randint(0,10)
-    LOG.info(f"Mapped to {restaurant_id}....")
+    store = random.randint(0,10)
+    LOG.info(f"Mapped to {store}....")
+    return store
+
+
+def encode_cursor(forecast_date: date, item_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{forecast_date.isoformat()}|{item_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Return the (forecast_date, item_id) key of the last row of the previous page"""
     try:
-        forecasts = session.query(Preds).filter(
-            Preds.store == restaurant_id
-        ).order_by(Preds.forecast_date).all()
-
-        forecast_list = [
-            Forecast(item_id=f.item,
-            forecast_date=f.forecast_date,
-            predicted_demand=f.yhat,
-            yhat_lower=f.yhat_lower)
-            for f in forecasts
-        ]
-        resp = DemandForecastResponse(
-            restaurant_id = str(restaurant_id),
-            predictions = forecast_list,
-            generated_at = datetime.now(),
-            total_items_forecasted=len(forecast_list)
-        )
-        return resp
-    
+        forecast_date, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(forecast_date), int(item_id)
+    except Exception:
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def _date_bounds(filters: ForecastFilter):
+    """Resolve start_date/end_date/horizon into an inclusive (start, end) date range"""
+    start, end = filters.start_date, filters.end_date
+    if filters.horizon is not None:
+        horizon_end = (start or date.today() + timedelta(days=1)) + timedelta(days=filters.horizon - 1)
+        end = min(end, horizon_end) if end else horizon_end
+    return start, end
+
+
+def _columns_from_snapshot(snapshot, store, filters: ForecastFilter):
+    """Read a store's forecasts from the memory-mapped serving arrays as columns"""
+    items, values = snapshot.get_store(store)
+    start, end = _date_bounds(filters)
+    first = max((start - snapshot.start_date).days, 0) if start else 0
+    last = min((end - snapshot.start_date).days + 1, snapshot.horizon) if end else snapshot.horizon
+    last = max(first, last)
+
+    # Date-major order to match the SQL path (ORDER BY forecast_date, item)
+    by_date = values[:, first:last].transpose(1, 0, 2)
+    offsets = np.broadcast_to(np.arange(first, last)[:, None], by_date.shape[:2])
+    item_grid = np.broadcast_to(items, by_date.shape[:2])
+
+    present = ~np.isnan(by_date[:, :, 0])
+    if filters.item_ids is not None:
+        present &= np.isin(item_grid, filters.item_ids)
+    if filters.cursor:
+        cursor_date, cursor_item = decode_cursor(filters.cursor)
+        cursor_offset = (cursor_date - snapshot.start_date).days
+        present &= (offsets > cursor_offset) | ((offsets == cursor_offset) & (item_grid > cursor_item))
+
+    offsets = offsets[present]
+    rows = slice(0, filters.limit + 1 if filters.limit else None)
+    dates = snapshot.dates
+    return {
+        "item_id": item_grid[present][rows].tolist(),
+        "forecast_date": [dates[offset] for offset in offsets[rows].tolist()],
+        "predicted_demand": by_date[:, :, 0][present][rows].tolist(),
+        "yhat_lower": by_date[:, :, 1][present][rows].tolist(),
+    }
+
+
+def _filtered_query(session: Session, filters: ForecastFilter, *columns):
+    """Build a query over the current run's forecasts with item, date range and keyset filters applied in SQL"""
+    # Rows of staged (half-written) and retired runs are never served
+    query = session.query(*columns).join(
+        Runs, and_(Runs.store == Preds.store, Runs.created_at == Preds.created_at)
+    ).filter(Runs.status == CURRENT_RUN)
+    start, end = _date_bounds(filters)
+    if filters.item_ids is not None:
+        query = query.filter(Preds.item.in_(filters.item_ids))
+    if start:
+        query = query.filter(Preds.forecast_date >= start)
+    if end:
+        query = query.filter(Preds.forecast_date <= end)
+    if filters.cursor:
+        # Keyset pagination on (forecast_date, item)
+        cursor_date, cursor_item = decode_cursor(filters.cursor)
+        query = query.filter(or_(
+            Preds.forecast_date > cursor_date,
+            and_(Preds.forecast_date == cursor_date, Preds.item > cursor_item),
+        ))
+    return query
+
+
+def _to_columns(rows):
+    item_ids, forecast_dates, yhat, yhat_lower = (list(col) for col in zip(*rows)) if rows else ([], [], [], [])
+    return {
+        "item_id": item_ids,
+        "forecast_date": forecast_dates,
+        "predicted_demand": yhat,
+        "yhat_lower": yhat_lower,
+    }
+
+
+def _columns_from_db(session: Session, store, filters: ForecastFilter):
+    """Read a store's forecasts from the forecasts table as columns, without ORM objects.
+    All filters and the page boundary are applied in SQL.
+    """
+    query = _filtered_query(
+        session, filters, Preds.item, Preds.forecast_date, Preds.yhat, Preds.yhat_lower
+    ).filter(
+        Preds.store == store
+    ).order_by(Preds.forecast_date, Preds.item)
+    if filters.limit:
+        query = query.limit(filters.limit + 1)
+    return _to_columns(query.all())
+
+
+def _columns_from_db_for_stores(session: Session, stores, filters: ForecastFilter):
+    """Read several stores' forecasts with a single ``store IN (...)`` query
+
+    Returns:
+        dict of store -> columns, stores without forecasts map to empty columns
+    """
+    rows = _filtered_query(
+        session, filters, Preds.store, Preds.item, Preds.forecast_date, Preds.yhat, Preds.yhat_lower
+    ).filter(
+        Preds.store.in_(list(stores))
+    ).order_by(Preds.store, Preds.forecast_date, Preds.item).all()
+
+    by_store = {store: _to_columns([]) for store in stores}
+    for store, store_rows in groupby(rows, key=itemgetter(0)):
+        by_store[store] = _to_columns([row[1:] for row in store_rows])
+    return by_store
+
+
+def _get_forecast_version(session: Session, store, forecast_store=None) -> Optional[ForecastVersion]:
+    """Identify the prediction run currently served for a store, without reading its rows
+
+    Returns:
+        ForecastVersion, or None if the store has no forecasts
+    """
+    snapshot = forecast_store.current() if forecast_store is not None else None
+    if snapshot is not None and snapshot.has_store(store):
+        return ForecastVersion(run_id=snapshot.run_id,
+                               model_version=snapshot.model_version,
+                               last_modified=snapshot.created_at)
+
+    current = session.query(Runs.created_at, Runs.model_version).filter(
+        Runs.store == store, Runs.status == CURRENT_RUN
+    ).first()
+    if current is None:
+        return None
+    # Every row of a run is stamped with the same created_at (see store_predictions)
+    return ForecastVersion(run_id=current.created_at.isoformat(),
+                           model_version=current.model_version,
+                           last_modified=current.created_at)
+
+
+def _get_forecast_columns(session: Session, store, forecast_store=None, filters: ForecastFilter = None):
+    """Get forecasts for a mapped store id as parallel lists keyed by Forecast field name
+
+    Returns:
+        (restaurant_id, columns, next_cursor) where restaurant_id is the store
+        id as a string and next_cursor is None on the last page
+    """
+    filters = filters or ForecastFilter()
+    try:
+        snapshot = forecast_store.current() if forecast_store is not None else None
+        if snapshot is not None and snapshot.has_store(store):
+            columns = _columns_from_snapshot(snapshot, store, filters)
+        else:
+            columns = _columns_from_db(session, store, filters)
+
+        next_cursor = None
+        if filters.limit and len(columns["item_id"]) > filters.limit:
+            columns = {name: values[:filters.limit] for name, values in columns.items()}
+            next_cursor = encode_cursor(columns["forecast_date"][-1], columns["item_id"][-1])
+        return str(store), columns, next_cursor
+
     except Exception as e:
         LOG.info(f"getting forecast failed with exception{e}")
         raise e
 
+
+def _get_demand_forecast(session: Session, store, forecast_store=None, filters: ForecastFilter = None) -> DemandForecastResponse:
+    restaurant_id, columns, next_cursor = _get_forecast_columns(session, store, forecast_store, filters)
+    forecast_list = [
+        Forecast(item_id=item_id,
+        forecast_date=forecast_date,
+        predicted_demand=predicted_demand,
+        yhat_lower=yhat_lower)
+        for item_id, forecast_date, predicted_demand, yhat_lower in zip(
+            columns["item_id"], columns["forecast_date"],
+            columns["predicted_demand"], columns["yhat_lower"])
+    ]
+    resp = DemandForecastResponse(
+        restaurant_id = restaurant_id,
+        predictions = forecast_list,
+        generated_at = datetime.now(),
+        total_items_forecasted=len(forecast_list),
+        next_cursor=next_cursor
+    )
+    return resp
+
+
+def _get_batch_forecast_columns(session: Session, restaurant_ids, forecast_store=None, filters: ForecastFilter = None):
+    """Get forecasts for many restaurants in one pass.
+    Stores in the latest serving store run are read from the mapped arrays, the
+    rest are resolved with one SQL query.
+
+    Returns:
+        list of (restaurant_id, columns) in request order
+    """
+    filters = filters or ForecastFilter()
+    stores = {restaurant_id: _map_restaurant_id(restaurant_id) for restaurant_id in restaurant_ids}
+    try:
+        snapshot = forecast_store.current() if forecast_store is not None else None
+        columns_by_store = {}
+        if snapshot is not None:
+            for store in set(stores.values()):
+                if snapshot.has_store(store):
+                    columns_by_store[store] = _columns_from_snapshot(snapshot, store, filters)
+
+        missing = set(stores.values()) - columns_by_store.keys()
+        if missing:
+            columns_by_store.update(_columns_from_db_for_stores(session, missing, filters))
+
+        LOG.info(f"Resolved forecasts for {len(stores)} restaurants ({len(missing)} stores from database)")
+        return [(restaurant_id, columns_by_store[stores[restaurant_id]]) for restaurant_id in restaurant_ids]
+
+    except Exception as e:
+        LOG.info(f"getting batch forecast failed with exception{e}")
+        raise e
+
+
+def _get_batch_demand_forecast(session: Session, restaurant_ids, forecast_store=None, filters: ForecastFilter = None) -> BatchDemandForecastResponse:
+    generated_at = datetime.now()
+    results = [
+        DemandForecastResponse(
+            restaurant_id=restaurant_id,
+            predictions=[
+                Forecast(item_id=item_id,
+                forecast_date=forecast_date,
+                predicted_demand=predicted_demand,
+                yhat_lower=yhat_lower)
+                for item_id, forecast_date, predicted_demand, yhat_lower in zip(
+                    columns["item_id"], columns["forecast_date"],
+                    columns["predicted_demand"], columns["yhat_lower"])
+            ],
+            generated_at=generated_at,
+            total_items_forecasted=len(columns["item_id"]),
+        )
+        for restaurant_id, columns in _get_batch_forecast_columns(session, restaurant_ids, forecast_store, filters)
+    ]
+    return BatchDemandForecastResponse(
+        total_restaurants=len(results),
+        results=results,
+        generated_at=generated_at,
+    )
@@ -0,0 +1,249 @@
+"""HTTP load test for the forecast API against a seeded forecasts database.
+
+Seeds N restaurants x M items x horizon rows into the ``forecasts`` table
+(temporary SQLite by default, or any SQLAlchemy URL), starts the API routes
+in-process under uvicorn and drives concurrent traffic with a weighted mix of
+requests, then reports latency percentiles, throughput and error rate per
+endpoint:
+
+    python -m benchmarks.loadtest --restaurants 11 --items 200 --horizon 15 \\
+        --concurrency 64 --duration 30 --mix get=8,columnar=1,batch=1
+"""
+import os
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+
+import httpx
+import structlog
+import uvicorn
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+
+from api.endpoints import router as api_router
+from api.db import create_session
+from api.models import base, PredictionResults, ForecastRun
+
+BASE_PATH = "/api/ai/demandforecast/predict"
+MODEL_VERSION = "loadtest"
+
+
+def seed_forecasts(engine, restaurants, items, horizon, chunk_size=10_000):
+    """Insert one run of forecasts for stores 0..restaurants-1 and return it as a DataFrame"""
+    base.metadata.create_all(bind=engine)
+    rng = np.random.default_rng(42)
+    start = date.today() + timedelta(days=1)
+    created_at = datetime.utcnow()
+
+    stores, item_ids, offsets = np.meshgrid(
+        np.arange(restaurants), np.arange(1, items + 1), np.arange(horizon), indexing="ij"
+    )
+    yhat = rng.gamma(4.0, 25.0, stores.size)
+    df = pd.DataFrame({
+        "store": stores.ravel(),
+        "item": item_ids.ravel(),
+        "forecast_date": [start + timedelta(days=int(offset)) for offset in offsets.ravel()],
+        "yhat": yhat,
+        "yhat_lower": yhat * 0.8,
+        "yhat_upper": yhat * 1.2,
+        "model_version": MODEL_VERSION,
+    })
+
+    records = df.assign(created_at=created_at).to_dict("records")
+    with engine.begin() as conn:
+        for i in range(0, len(records), chunk_size):
+            conn.execute(insert(PredictionResults.__table__), records[i:i + chunk_size])
+        # The API serves each store's current run only
+        conn.execute(insert(ForecastRun.__table__), [
+            {"store": int(store), "created_at": created_at, "row_count": items * horizon,
+             "model_version": MODEL_VERSION, "status": "current"}
+            for store in range(restaurants)
+        ])
+    print(f"🌱 Seeded {len(df):,} forecasts ({restaurants} restaurants x {items} items x {horizon} days)")
+    return df
+
+
+def build_app(engine, forecast_store=None):
+    """The API routes with the same state main.py sets up, minus the pipeline lifespan"""
+    app = FastAPI(title="Restaurant AI Service (load test)")
+    app.include_router(api_router, prefix="/api", tags=["api"])
+    app.state.sessionmaker = create_session(engine)
+    app.state.forecast_store = forecast_store
+    return app
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app):
+    """Run uvicorn in a daemon thread and wait until it accepts connections"""
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def _scenarios(restaurants, items, batch_size):
+    """Request builders keyed by endpoint name, each returning (method, path, params, json)"""
+    def restaurant():
+        return str(random.randrange(restaurants))
+
+    return {
+        "get": lambda: ("GET", BASE_PATH, {"restaurant_id": restaurant()}, None),
+        "fast_json": lambda: ("GET", BASE_PATH, {"restaurant_id": restaurant(), "format": "json"}, None),
+        "columnar": lambda: ("GET", BASE_PATH, {"restaurant_id": restaurant(), "format": "columnar"}, None),
+        "ndjson": lambda: ("GET", BASE_PATH, {"restaurant_id": restaurant(), "format": "ndjson"}, None),
+        "get_item": lambda: ("GET", BASE_PATH, {"restaurant_id": restaurant(),
+                                                "item_ids": random.randint(1, items), "horizon": 1}, None),
+        "batch": lambda: ("POST", BASE_PATH + "/batch", None,
+                          {"restaurant_ids": [restaurant() for _ in range(batch_size)]}),
+    }
+
+
+def parse_mix(value):
+    """'get=8,batch=1' -> {'get': 8.0, 'batch': 1.0}"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def drive(base_url, mix, scenarios, concurrency, duration, timeout):
+    """Issue requests from ``concurrency`` workers for ``duration`` seconds"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                name = random.choices(names, weights)[0]
+                method, path, params, body = scenarios[name]()
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, params=params, json=body)
+                    await response.aread()
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                samples[name].append(time.perf_counter() - start)
+                if not ok:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return samples, errors, elapsed
+
+
+def summarize(samples, errors, elapsed):
+    report = []
+    for name, latencies in samples.items():
+        if not latencies:
+            continue
+        ms = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        report.append({
+            "endpoint": name,
+            "requests": len(latencies),
+            "errors": errors[name],
+            "error_rate": errors[name] / len(latencies),
+            "throughput_rps": len(latencies) / elapsed,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "max_ms": float(ms.max()),
+        })
+    return report
+
+
+def print_report(report, elapsed, concurrency):
+    total = sum(r["requests"] for r in report)
+    print(f"\n📊 {total:,} requests in {elapsed:.1f}s with {concurrency} concurrent clients "
+          f"({total / elapsed:,.0f} req/s)")
+    print(f"{'endpoint':<12}{'requests':>10}{'rps':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in report:
+        print(f"{r['endpoint']:<12}{r['requests']:>10,}{r['throughput_rps']:>10.1f}{r['error_rate']:>9.2%}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restaurants", type=int, default=11, help="Stores to seed (the API maps ids to 0-10)")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--horizon", type=int, default=15, help="Forecast days per item")
+    parser.add_argument("--db-url", help="Database to seed instead of a temporary SQLite file")
+    parser.add_argument("--no-seed", action="store_true", help="Use the forecasts already in --db-url")
+    parser.add_argument("--serving-store", action="store_true",
+                        help="Also publish the seeded run to a memory-mapped serving store")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of traffic")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("get=6,columnar=1,get_item=2,batch=1"),
+                        help="Weighted endpoint mix, e.g. get=8,fast_json=1,ndjson=1,batch=1")
+    parser.add_argument("--batch-size", type=int, default=10, help="Restaurants per batch request")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    # Per-request info logs would dominate the measurement
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    workdir = tempfile.mkdtemp(prefix="demand-loadtest-")
+    engine = create_engine(args.db_url or f"sqlite:///{os.path.join(workdir, 'forecasts.db')}")
+
+    scenarios = _scenarios(args.restaurants, args.items, args.batch_size)
+    unknown = set(args.mix) - set(scenarios)
+    if unknown:
+        parser.error(f"Unknown endpoints in --mix: {', '.join(sorted(unknown))}. Choose from {', '.join(scenarios)}")
+
+    forecast_store = None
+    if not args.no_seed:
+        seeded = seed_forecasts(engine, args.restaurants, args.items, args.horizon)
+        if args.serving_store:
+            from ml_pipeline.serving_store import ForecastServingStore
+            forecast_store = ForecastServingStore(os.path.join(workdir, "forecast_store"))
+            forecast_store.publish(seeded)
+
+    server, thread, base_url = start_server(build_app(engine, forecast_store))
+    try:
+        samples, errors, elapsed = asyncio.run(
+            drive(base_url, args.mix, scenarios, args.concurrency, args.duration, args.timeout)
+        )
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    report = summarize(samples, errors, elapsed)
+    print_report(report, elapsed, args.concurrency)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now().isoformat(),
+                "config": {k: v for k, v in vars(args).items() if k != "db_url"},
+                "elapsed_seconds": elapsed,
+                "results": report,
+            }, f, indent=2)
+        print(f"\n📄 Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Offline benchmarks for the ML pipeline hot paths.
+
+Runs every stage against a throwaway SQLite predictions database, a local Spark
+session with a temporary warehouse and a file-based MLflow store, so no server
+or network access is needed. Results are written as JSON so that two commits
+can be compared:
+
+    python -m benchmarks.run_benchmarks --sizes 5x5x120,20x20x365 --output bench.json
+    python -m benchmarks.run_benchmarks --sizes 5x5x120 --compare bench.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime, timedelta
+
+STAGES = [
+    "generate_synthetic_data",
+    "create_features",
+    "prepare_training_data",
+    "train",
+    "predict_daily_demand",
+    "store_predictions",
+]
+
+
+def _configure_environment(workdir, db_url):
+    """Point every backend at local, disposable storage before ml_pipeline is imported"""
+    db_url = db_url or f"sqlite:///{os.path.join(workdir, 'predictions.db')}"
+    os.environ["RAW_DB_URL"] = db_url
+    os.environ["FEATURE_DB_URL"] = db_url
+    os.environ["PREDICTIONS_DB_URL"] = db_url
+    os.environ["MLFLOW_TRACKING_URI"] = f"file://{os.path.join(workdir, 'mlruns')}"
+    os.environ["FEAST_REPO_PATH"] = os.path.join(workdir, "feature_store")
+    os.environ["FORECAST_STORE_PATH"] = os.path.join(workdir, "forecast_store")
+    os.environ["WANDB_MODE"] = "disabled"
+
+
+def _local_spark(workdir):
+    from pyspark.sql import SparkSession
+
+    # Created first so that FeatureEngineer/DemandPredictor getOrCreate() reuse it
+    return (
+        SparkSession.builder
+        .master("local[*]")
+        .appName("demand-forecast-benchmarks")
+        .config("spark.sql.warehouse.dir", os.path.join(workdir, "spark-warehouse"))
+        .config("spark.sql.shuffle.partitions", "4")
+        .config("spark.ui.enabled", "false")
+        .getOrCreate()
+    )
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_sizes(value):
+    """'5x5x120,20x20x365' -> [(5, 5, 120), (20, 20, 365)] as (stores, items, days)"""
+    sizes = []
+    for size in value.split(","):
+        stores, items, days = (int(part) for part in size.lower().split("x"))
+        sizes.append((stores, items, days))
+    return sizes
+
+
+def run_size(components, stores, items, days, repeat, stages):
+    """Run every selected stage ``repeat`` times for one store x item x day size"""
+    from ml_pipeline.extractor import DataExtractor
+
+    extractor, feature_engineer, trainer, predictor = components
+    end_date = datetime(2025, 1, 1)
+    start_date = end_date - timedelta(days=days - 1)
+    timings = {stage: [] for stage in stages}
+    rows = {}
+
+    for _ in range(repeat):
+        # Each stage feeds the next, so stages that are not measured still run
+        seconds, df = _timed(DataExtractor._generate_synthetic_data, extractor,
+                             start_date, end_date, stores, items)
+        timings.get("generate_synthetic_data", []).append(seconds)
+        rows["generate_synthetic_data"] = len(df)
+
+        seconds, _ = _timed(feature_engineer.create_features, df)
+        timings.get("create_features", []).append(seconds)
+        rows["create_features"] = len(df)
+
+        seconds, train_df = _timed(feature_engineer.prepare_training_data)
+        timings.get("prepare_training_data", []).append(seconds)
+        rows["prepare_training_data"] = 0 if train_df is None else len(train_df)
+
+        if not {"train", "predict_daily_demand", "store_predictions"} & set(stages):
+            continue
+
+        seconds, _ = _timed(trainer.train, train_df)
+        timings.get("train", []).append(seconds)
+        rows["train"] = len(train_df)
+        predictor.model = trainer.model
+
+        seconds, predictions = _timed(predictor.predict_daily_demand)
+        timings.get("predict_daily_demand", []).append(seconds)
+        rows["predict_daily_demand"] = 0 if predictions is None else len(predictions)
+
+        if predictions is not None:
+            seconds, _ = _timed(predictor.store_predictions, predictions)
+            timings.get("store_predictions", []).append(seconds)
+            rows["store_predictions"] = len(predictions)
+
+    results = []
+    for stage in stages:
+        if not timings[stage]:
+            continue
+        best = min(timings[stage])
+        results.append({
+            "stage": stage,
+            "stores": stores,
+            "items": items,
+            "days": days,
+            "rows": rows.get(stage, 0),
+            "repeat": len(timings[stage]),
+            "seconds_min": best,
+            "seconds_median": statistics.median(timings[stage]),
+            "rows_per_sec": rows.get(stage, 0) / best if best > 0 else None,
+        })
+    return results
+
+
+def compare(results, baseline_path):
+    """Print the min-time ratio of each stage against a previous results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {
+        (r["stage"], r["stores"], r["items"], r["days"]): r["seconds_min"]
+        for r in baseline["results"]
+    }
+    print(f"\nComparison against {baseline_path} ({baseline.get('git_commit')})")
+    print(f"{'stage':<26}{'size':>14}{'before':>10}{'after':>10}{'ratio':>8}")
+    for r in results:
+        key = (r["stage"], r["stores"], r["items"], r["days"])
+        if key not in previous:
+            continue
+        ratio = r["seconds_min"] / previous[key] if previous[key] else float("nan")
+        size = f"{r['stores']}x{r['items']}x{r['days']}"
+        print(f"{r['stage']:<26}{size:>14}{previous[key]:>10.3f}{r['seconds_min']:>10.3f}{ratio:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5x5x120", type=parse_sizes,
+                        help="Comma separated STORESxITEMSxDAYS sizes (default: 5x5x120)")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"Comma separated subset of: {', '.join(STAGES)}")
+    parser.add_argument("--repeat", default=1, type=int, help="Runs per size, the minimum is reported")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--db-url", help="Predictions database to use instead of a temporary SQLite file")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the temporary working directory")
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="demand-bench-")
+    _configure_environment(workdir, args.db_url)
+    _local_spark(workdir)
+
+    from ml_pipeline.config import Config
+    from ml_pipeline.extractor import DataExtractor
+    from ml_pipeline.preprocessor import FeatureEngineer
+    from ml_pipeline.trainer import ProphetTrainer
+    from ml_pipeline.predictor import DemandPredictor
+
+    try:
+        extractor = DataExtractor(num_stores=1, num_items=1)
+        feature_engineer = FeatureEngineer()
+        trainer = ProphetTrainer(Config.MLFLOW_TRACKING_URI, Config.WANDB_PROJECT, Config.WANDB_API_KEY)
+        predictor = DemandPredictor(Config.MLFLOW_TRACKING_URI, Config.MODEL_NAME, Config.PREDICTIONS_DB_URL)
+        components = (extractor, feature_engineer, trainer, predictor)
+
+        results = []
+        for stores, items, days in args.sizes:
+            print(f"⏱️  Benchmarking {stores} stores x {items} items x {days} days")
+            results.extend(run_size(components, stores, items, days, args.repeat, stages))
+
+        report = {
+            "git_commit": _git_commit(),
+            "created_at": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+        print(f"\n{'stage':<26}{'size':>14}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+        for r in results:
+            size = f"{r['stores']}x{r['items']}x{r['days']}"
+            rate = f"{r['rows_per_sec']:,.0f}" if r["rows_per_sec"] else "-"
+            print(f"{r['stage']:<26}{size:>14}{r['rows']:>10,}{r['seconds_min']:>10.3f}{rate:>12}")
+        print(f"\n📄 Results written to {args.output}")
+
+        if args.compare:
+            compare(results, args.compare)
+    finally:
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.endpoints import router as api_router
+from api.metrics import router as metrics_router, record_request_latency
 from api.db import _create_engine, DB_CONN_STRING, create_session, Engine, SessionMaker
 
 
 from ml_pipeline.orchestrator import MLPipelineOrchestrator
+from ml_pipeline.serving_store import ForecastServingStore
+from ml_pipeline.notification_service import router as notification_router
 from ml_pipeline.config import Config
 
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +27,7 @@ config = Config()
 class State(TypedDict):
     engine: Engine
     sessionmaker: SessionMaker
+    forecast_store: ForecastServingStore
 
 
 @asynccontextmanager
@@ -31,6 +35,7 @@ async def lifespan(app: FastAPI) -> AsyncIterator:
     LOG.info("AI API starting.....")
     
     orchestrator = MLPipelineOrchestrator()
+    app.state.orchestrator = orchestrator
     LOG.info("ML pipeline orchestrator instantiated....")
 
     # # orchestrator_thread = threading.Thread(target=orchestrator.run, daemon=True)
@@ -41,6 +46,8 @@ async def lifespan(app: FastAPI) -> AsyncIterator:
     engine = _create_engine(DB_CONN_STRING)
     sessionmaker = create_session(engine)
     app.state.sessionmaker = sessionmaker
+    forecast_store = ForecastServingStore(config.FORECAST_STORE_PATH)
+    app.state.forecast_store = forecast_store
 
     try:
         LOG.info("API Started.....")
@@ -48,11 +55,14 @@ async def lifespan(app: FastAPI) -> AsyncIterator:
 
         yield {
             "engine":engine,
-            "sessionmaker":sessionmaker
+            "sessionmaker":sessionmaker,
+            "forecast_store":forecast_store
         }
     
     finally:
         LOG.info("API Shutting down .....")
+        # Send whatever experiment tracking is still buffered
+        orchestrator.trainer.tracker.flush(timeout=10)
 
 app = FastAPI(
     title="Restaurant AI Service",
@@ -69,7 +79,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.middleware("http")(record_request_latency)
+
 app.include_router(api_router, prefix="/api", tags=["api"])
+app.include_router(metrics_router)
+app.include_router(notification_router)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,211 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .tuning import DEFAULT_PARAMS
+from .intervals import INTERVAL_MODES, REDUCED_SAMPLES
+from .utils import LOG
+
+CONFIDENCE_INTERVAL = 0.95
+
+
+def rolling_origins(last_date, n_folds=3, horizon=15, step=None):
+    """Cutoff dates, oldest first: each fold trains up to its cutoff and forecasts ``horizon`` days"""
+    step = step or horizon
+    last_date = pd.Timestamp(last_date)
+    return [last_date - pd.Timedelta(days=horizon + step * i) for i in reversed(range(n_folds))]
+
+
+def _warm_start_params(model):
+    """Fitted Prophet parameters in the form Prophet.fit(init=...) expects"""
+    params = {name: model.params[name][0][0] for name in ("k", "m", "sigma_obs")}
+    params.update({name: model.params[name][0] for name in ("delta", "beta")})
+    return params
+
+
+def _backtest_series(series, cutoffs, horizon, params, interval_mode="full", interval_modes=(),
+                     reduced_samples=REDUCED_SAMPLES):
+    """Rolling-origin forecasts of one series (runs in a worker process)
+
+    Folds are fitted oldest first and every fit is warm-started from the
+    previous fold's parameters, so later folds converge in a few iterations.
+    Forecasts come from the batch predictor, which matches Prophet.predict,
+    with ``interval_mode`` intervals; they are also computed once per mode in
+    ``interval_modes`` for comparison.
+
+    Returns:
+        dict of arrays with one entry per (fold, horizon day) that has actuals,
+        plus the seconds spent on each mode's intervals
+    """
+    from prophet import Prophet
+    from .prophet_batch import ProphetBatchPredictor
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    logging.getLogger("prophet").setLevel(logging.WARNING)
+
+    df = series.sort_values("ds")
+    ds = df["ds"].to_numpy()
+    results = {name: [] for name in ("fold", "step", "y", "yhat", "yhat_lower", "yhat_upper")}
+    for mode in interval_modes:
+        results.update({f"yhat_lower_{mode}": [], f"yhat_upper_{mode}": []})
+    seconds = dict.fromkeys(interval_modes, 0.0)
+    init = None
+    for fold, cutoff in enumerate(cutoffs):
+        train = df[ds <= np.datetime64(cutoff)]
+        test = df[(ds > np.datetime64(cutoff)) & (ds <= np.datetime64(cutoff + pd.Timedelta(days=horizon)))]
+        if len(train) < 2 or test.empty:
+            continue
+        model = Prophet(daily_seasonality=True, weekly_seasonality=True, yearly_seasonality=True,
+                        interval_width=CONFIDENCE_INTERVAL, **params)
+        model.fit(train, init=init) if init is not None else model.fit(train)
+        init = _warm_start_params(model)
+
+        # Forecast days run from the last training date; keep the ones with actuals
+        batch = ProphetBatchPredictor.from_models({(0, 0): model})
+        offset = ((test["ds"] - train["ds"].max()).dt.days - 1).to_numpy()
+        test, offset = test[offset < horizon], offset[offset < horizon]
+        forecast = batch.predict_rows([0], horizon=horizon, interval_mode=interval_mode,
+                                      reduced_samples=reduced_samples)
+        for mode in interval_modes:
+            bounds = batch.predict_rows([0], horizon=horizon, interval_mode=mode,
+                                        reduced_samples=reduced_samples)
+            seconds[mode] += batch.interval_cost["seconds"]
+            results[f"yhat_lower_{mode}"].append(bounds["yhat_lower"][0, offset])
+            results[f"yhat_upper_{mode}"].append(bounds["yhat_upper"][0, offset])
+
+        results["fold"].append(np.full(len(test), fold))
+        results["step"].append(((test["ds"] - cutoff).dt.days).to_numpy())
+        results["y"].append(test["y"].to_numpy(dtype=np.float64))
+        for column in ("yhat", "yhat_lower", "yhat_upper"):
+            results[column].append(forecast[column][0, offset])
+    results = {name: np.concatenate(values) if values else np.empty(0) for name, values in results.items()}
+    results["interval_seconds"] = seconds
+    return results
+
+
+def forecast_metrics(y, yhat, lower, upper, groups=None, n_groups=None):
+    """MAE, RMSE, MAPE (%, over non-zero actuals) and interval coverage
+
+    With ``groups`` (integer codes per row) every metric is an array with one
+    value per group, computed with bincount instead of a Python loop.
+    """
+    if groups is None:
+        groups = np.zeros(len(y), dtype=np.int64)
+        n_groups = 1
+    n_groups = n_groups or (int(groups.max()) + 1 if len(groups) else 0)
+
+    def mean(values, weights=None):
+        weights = np.ones(len(values)) if weights is None else weights
+        total = np.bincount(groups, weights=values * weights, minlength=n_groups)
+        count = np.bincount(groups, weights=weights, minlength=n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / count, np.nan)
+
+    error = y - yhat
+    nonzero = (y != 0).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ape = np.where(y != 0, np.abs(error) / np.abs(y), 0.0)
+    return {
+        "mae": mean(np.abs(error)),
+        "rmse": np.sqrt(mean(error ** 2)),
+        "mape": 100 * mean(ape, nonzero),
+        "coverage": mean(((y >= lower) & (y <= upper)).astype(np.float64)),
+    }
+
+
+class Backtester:
+    """Rolling-origin evaluation of Prophet across all series in a process pool
+
+    Besides the point metrics, every fold's intervals are computed in each of
+    ``interval_modes`` so the summary shows what each mode costs (seconds)
+    and delivers (coverage, mean width) on the same forecasts.
+    """
+
+    def __init__(self, n_folds=3, horizon=15, step=None, max_workers=None, params=None,
+                 interval_mode="full", interval_modes=INTERVAL_MODES, reduced_samples=REDUCED_SAMPLES):
+        self.n_folds = n_folds
+        self.horizon = horizon
+        self.step = step
+        self.max_workers = max_workers or os.cpu_count()
+        self.params = params or dict(DEFAULT_PARAMS)
+        # Mode of the headline coverage; all interval_modes are reported alongside
+        self.interval_mode = interval_mode
+        self.interval_modes = tuple(interval_modes)
+        self.reduced_samples = reduced_samples
+
+    def run(self, sales_df):
+        """Backtest every store-item series of a sales history (date, store, item, sales)
+
+        Returns:
+            (summary, per_series, per_step): dict of overall metrics, a DataFrame with
+            one row per series and a DataFrame with metrics by horizon day
+        """
+        start = time.perf_counter()
+        sales = sales_df[["date", "store", "item", "sales"]].rename(columns={"date": "ds", "sales": "y"})
+        sales["ds"] = pd.to_datetime(sales["ds"])
+        cutoffs = rolling_origins(sales["ds"].max(), self.n_folds, self.horizon, self.step)
+
+        keys, frames = [], []
+        for key, frame in sales.groupby(["store", "item"], sort=True):
+            keys.append(key)
+            frames.append(frame[["ds", "y"]])
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(_backtest_series, frame, cutoffs, self.horizon, self.params,
+                                   self.interval_mode, self.interval_modes, self.reduced_samples)
+                       for frame in frames]
+            outputs = []
+            for key, future in zip(keys, futures):
+                try:
+                    outputs.append(future.result())
+                except Exception as e:
+                    LOG.info(f"❌ Backtest failed for Store {key[0]}, Item {key[1]}: {e}")
+                    outputs.append(None)
+
+        results = [(i, out) for i, out in enumerate(outputs) if out is not None and len(out["y"])]
+        if not results:
+            LOG.info("⚠️  Backtest produced no forecasts")
+            return {}, pd.DataFrame(), pd.DataFrame()
+        series_codes = np.concatenate([np.full(len(out["y"]), i) for i, out in results])
+        stacked = {name: np.concatenate([out[name] for _, out in results])
+                   for name in results[0][1] if name != "interval_seconds"}
+        args = (stacked["y"], stacked["yhat"], stacked["yhat_lower"], stacked["yhat_upper"])
+
+        summary = {name: float(values[0]) for name, values in forecast_metrics(*args).items()}
+        per_series = pd.DataFrame(forecast_metrics(*args, groups=series_codes, n_groups=len(keys)))
+        per_series.insert(0, "store", [key[0] for key in keys])
+        per_series.insert(1, "item", [key[1] for key in keys])
+        per_series["forecasts"] = np.bincount(series_codes, minlength=len(keys))
+        steps = stacked["step"].astype(np.int64)
+        per_step = pd.DataFrame(forecast_metrics(*args, groups=steps, n_groups=self.horizon + 1)) \
+            .rename_axis("step").reset_index().iloc[1:]
+
+        for mode in self.interval_modes:
+            lower, upper = stacked[f"yhat_lower_{mode}"], stacked[f"yhat_upper_{mode}"]
+            summary[f"coverage_{mode}"] = float(np.mean((stacked["y"] >= lower) & (stacked["y"] <= upper)))
+            summary[f"interval_width_{mode}"] = float(np.mean(upper - lower))
+            summary[f"interval_seconds_{mode}"] = sum(out["interval_seconds"][mode] for _, out in results)
+
+        summary["series"] = int((per_series["forecasts"] > 0).sum())
+        summary["folds"] = len(cutoffs)
+        summary["seconds"] = time.perf_counter() - start
+        LOG.info(f"📏 Backtested {summary['series']} series x {len(cutoffs)} folds in {summary['seconds']:.1f}s: "
+                 f"MAE {summary['mae']:.2f}, RMSE {summary['rmse']:.2f}, MAPE {summary['mape']:.1f}%, "
+                 f"coverage {summary['coverage']:.1%}")
+        for mode in self.interval_modes:
+            LOG.info(f"📐 Intervals '{mode}': coverage {summary[f'coverage_{mode}']:.1%}, "
+                     f"mean width {summary[f'interval_width_{mode}']:.2f}, "
+                     f"{summary[f'interval_seconds_{mode}']:.2f}s")
+        return summary, per_series, per_step
+
+    @staticmethod
+    def log(tracker, run, per_series, per_step):
+        """Log error by horizon day and the per-series table to a tracked run.
+
+        The summary is logged by the caller together with the run's other metrics.
+        """
+        for row in per_step.itertuples():
+            tracker.log_metrics(run, {"backtest_mae_by_step": row.mae, "backtest_coverage_by_step": row.coverage},
+                                step=int(row.step))
+        tracker.log_dict(run, per_series.to_dict(orient="list"), "backtest/per_series.json")
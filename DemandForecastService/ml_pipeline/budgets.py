@@ -0,0 +1,79 @@
+import signal
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from .intervals import analytic_bounds
+
+# model_version of forecasts made by the fallback instead of the series' model
+FALLBACK_MODEL_VERSION = "seasonal_naive_v1"
+SEASON_DAYS = 7
+
+
+class BudgetExceeded(TimeoutError):
+    """A series ran out of its time budget"""
+
+
+def can_interrupt():
+    """Budgets interrupt running code with SIGALRM: POSIX only, and only in the main thread"""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def time_budget(seconds):
+    """Raise BudgetExceeded inside the block once ``seconds`` of wall-clock time have passed
+
+    Does nothing when seconds is 0/None or the caller cannot be interrupted
+    (see can_interrupt). Not nestable: the SIGALRM handler in place before
+    is restored afterwards, but its timer is not.
+    """
+    if not seconds or not can_interrupt():
+        yield
+        return
+
+    def expire(signum, frame):
+        raise BudgetExceeded(f"Time budget of {seconds}s exceeded")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def seasonal_naive(history, horizon, interval_width=0.95, intervals=True, season=SEASON_DAYS):
+    """Forecast every day as the same weekday of the last observed week
+
+    Cheap stand-in for series whose model ran out of time (or has none).
+    The interval is a normal approximation from the history's seasonal
+    differences, widening with every season ahead.
+
+    Args:
+        history: one series with ds and y columns
+        intervals: False gives yhat_lower == yhat_upper == yhat, like interval mode "off"
+
+    Returns:
+        DataFrame with ds, yhat, yhat_lower and yhat_upper for the ``horizon`` days after the history
+    """
+    # Daily grid, so positions match weekdays even when days are missing
+    daily = history.assign(ds=pd.to_datetime(history["ds"])).groupby("ds")["y"].mean().asfreq("D").ffill()
+    y = daily.to_numpy(dtype=float)
+    steps = np.arange(horizon)
+    if len(y) >= season:
+        yhat = y[len(y) - season + steps % season]
+    else:
+        yhat = np.full(horizon, y.mean())
+
+    lower, upper = yhat, yhat
+    if intervals:
+        differences = y[season:] - y[:-season]
+        sigma = differences.std() if len(differences) > 1 else 0.0
+        lower, upper = analytic_bounds(yhat, sigma * np.sqrt(steps // season + 1), 0.0, 0.0, interval_width)
+    return pd.DataFrame({
+        "ds": pd.date_range(daily.index[-1] + pd.Timedelta(days=1), periods=horizon, freq="D"),
+        "yhat": yhat,
+        "yhat_lower": lower,
+        "yhat_upper": upper,
+    })
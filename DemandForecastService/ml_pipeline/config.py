@@ -21,14 +21,81 @@ class Config:
     PREDICTIONS_DB_URL = os.getenv("PREDICTIONS_DB_URL")
     
     # Feature Store
-    FEAST_REPO_PATH = os.getenv("FEAST_REPO_PATH", "./feature_store")
+    FEAST_REPO_PATH = os.getenv("FEAST_REPO_PATH", "./feast")
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+    # In-process cache in front of Feast online lookups
+    FEATURE_CACHE_TTL = float(os.getenv("FEATURE_CACHE_TTL", "300"))
+    FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", "10000"))
+
+    # Serving store (memory-mapped forecast arrays read by the API)
+    FORECAST_STORE_PATH = os.getenv("FORECAST_STORE_PATH", "./forecast_store")
     
     # Model Registry
     MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "http://127.0.0.1:8000")
     WANDB_PROJECT = os.getenv("WANDB_PROJECT", "restaurant-demand-forecast")
     WANDB_API_KEY = os.getenv("WANDB_API_KEY")
+    # Experiment tracking is buffered and sent from a background worker; when the
+    # MLflow server is unreachable (or TRACKING_OFFLINE is set) runs go to a local SQLite MLflow store
+    TRACKING_OFFLINE = os.getenv("TRACKING_OFFLINE", "false").lower() in ("1", "true", "yes")
+    TRACKING_OFFLINE_DIR = os.getenv("TRACKING_OFFLINE_DIR", "./mlruns-offline")
+    # Trained models are saved here first, so prediction never waits for an upload
+    MODEL_DIR = os.getenv("MODEL_DIR", "./models")
     
+    # Dashboard notifications (WebSocket fan-out)
+    NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", "16"))
+    # "coalesce" replaces a slow client's backlog with full snapshots of its restaurants, "drop" disconnects it
+    NOTIFICATION_SLOW_CONSUMER_POLICY = os.getenv("NOTIFICATION_SLOW_CONSUMER_POLICY", "coalesce")
+    NOTIFICATION_SEND_TIMEOUT = float(os.getenv("NOTIFICATION_SEND_TIMEOUT", "5.0"))
+
+    # Forecasts table retention: keep each store's last FORECAST_RETENTION_RUNS runs, none older
+    # than FORECAST_RETENTION_DAYS days (0 disables a limit); the current run is always kept.
+    # FORECAST_PARTITIONED partitions the table by created_at day (PostgreSQL: new tables only,
+    # MySQL), so expired days are dropped as whole partitions instead of deleted row by row
+    FORECAST_RETENTION_RUNS = int(os.getenv("FORECAST_RETENTION_RUNS", "24"))
+    FORECAST_RETENTION_DAYS = int(os.getenv("FORECAST_RETENTION_DAYS", "7"))
+    FORECAST_PARTITIONED = os.getenv("FORECAST_PARTITIONED", "false").lower() in ("1", "true", "yes")
+
+    # Profiling (sampling CPU profile + tracemalloc peaks per stage), off by default
+    PROFILE_PIPELINES = os.getenv("PROFILE_PIPELINES", "false").lower() in ("1", "true", "yes")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.01"))
+    # Token for the /ai/admin endpoints (sent as X-Admin-Token); unset disables them
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
     # Model settings
+    # "prophet" fits one model per store-item series, "xgboost" one global model for all of them
+    FORECAST_BACKEND = os.getenv("FORECAST_BACKEND", "prophet")
+    # Prophet: fit one model per store-item series (saved as one memory-mapped model bundle)
+    # instead of a single model on the aggregated training frame
+    PROPHET_PER_SERIES = os.getenv("PROPHET_PER_SERIES", "false").lower() in ("1", "true", "yes")
     MODEL_NAME = "demand_forecasting_xgb"
+    # xgboost: forecast directly from the feature store's latest materialized lags instead of
+    # replaying each series' sales history through the recursive forecast
+    XGB_ONLINE_FEATURES = os.getenv("XGB_ONLINE_FEATURES", "false").lower() in ("1", "true", "yes")
+    # Predict all Prophet series in one vectorized NumPy pass (falls back to Prophet.predict per series)
+    PROPHET_BATCH_PREDICT = os.getenv("PROPHET_BATCH_PREDICT", "true").lower() in ("1", "true", "yes")
+    # Prediction intervals: "full" (1000 simulated paths), "reduced" (INTERVAL_SAMPLES paths),
+    # "analytic" (normal approximation, no simulation) or "off" (yhat only, bounds equal yhat)
+    INTERVAL_MODE = os.getenv("INTERVAL_MODE", "full")
+    INTERVAL_SAMPLES = int(os.getenv("INTERVAL_SAMPLES", "100"))
+    # Per-series time budgets (seconds, 0 disables): a series whose Prophet fit or predict
+    # runs longer is cancelled and forecast with a seasonal naive baseline instead
+    SERIES_FIT_BUDGET_SECONDS = float(os.getenv("SERIES_FIT_BUDGET_SECONDS", "120"))
+    SERIES_PREDICT_BUDGET_SECONDS = float(os.getenv("SERIES_PREDICT_BUDGET_SECONDS", "30"))
+    # Sharded prediction: stores are split into shards on a SQLite work queue that several
+    # processes or nodes (sharing PREDICTION_QUEUE_PATH and MODEL_DIR) claim with leases;
+    # finished shards are kept, so an interrupted run resumes where it stopped
+    SHARDED_PREDICTION = os.getenv("SHARDED_PREDICTION", "false").lower() in ("1", "true", "yes")
+    PREDICTION_QUEUE_PATH = os.getenv("PREDICTION_QUEUE_PATH", "./prediction_queue")
+    PREDICTION_SHARD_SIZE = int(os.getenv("PREDICTION_SHARD_SIZE", "200"))
+    PREDICTION_LEASE_SECONDS = int(os.getenv("PREDICTION_LEASE_SECONDS", "300"))
+    PREDICTION_MAX_ATTEMPTS = int(os.getenv("PREDICTION_MAX_ATTEMPTS", "3"))
+    # Prophet hyperparameter search before training (process pool, successive halving)
+    TUNE_HYPERPARAMETERS = os.getenv("TUNE_HYPERPARAMETERS", "false").lower() in ("1", "true", "yes")
+    TUNING_MAX_TRIALS = int(os.getenv("TUNING_MAX_TRIALS", "24"))
+    TUNING_MAX_WORKERS = int(os.getenv("TUNING_MAX_WORKERS", str(os.cpu_count() or 1)))
+    TUNING_SERIES = int(os.getenv("TUNING_SERIES", "12"))
+    # Rolling-origin backtest of every series, logged with the trained model
+    BACKTEST_ON_TRAIN = os.getenv("BACKTEST_ON_TRAIN", "false").lower() in ("1", "true", "yes")
+    BACKTEST_FOLDS = int(os.getenv("BACKTEST_FOLDS", "3"))
     MODEL_STAGE = "Production"
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = [
+    "demand_lag_1",
+    "demand_lag_7",
+    "demand_rolling_mean_7",
+    "demand_rolling_std_7",
+    "item_avg_quantity",
+    "restaurant_avg_revenue",
+    "day_of_week",
+    "is_weekend",
+]
+
+
+def _group_positions(codes):
+    """Position of every row inside its group; rows must be sorted by group"""
+    starts = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+    lengths = np.diff(np.r_[starts, len(codes)])
+    return np.arange(len(codes)) - np.repeat(starts, lengths)
+
+
+def _lag(values, positions, k):
+    lagged = np.full(len(values), np.nan)
+    valid = positions >= k
+    lagged[valid] = values[np.flatnonzero(valid) - k]
+    return lagged
+
+
+def _trailing_window(values, positions, window):
+    """Mean and sample std of the ``window`` rows before each row of its group.
+
+    Computed from prefix sums, so the cost is O(rows) whatever the window.
+    """
+    prefix = np.r_[0.0, np.cumsum(values)]
+    prefix_sq = np.r_[0.0, np.cumsum(values * values)]
+    rows = np.arange(len(values))
+    n = np.minimum(positions, window)
+    total = prefix[rows] - prefix[rows - n]
+    total_sq = prefix_sq[rows] - prefix_sq[rows - n]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(n > 0, total / n, np.nan)
+        var = np.where(n > 1, (total_sq - total * total / n) / (n - 1), np.nan)
+    return mean, np.sqrt(np.clip(var, 0, None))
+
+
+def _expanding_mean(values, codes, positions, counted, prior_sum, prior_count):
+    """Mean of all earlier values of each group, including totals carried over from earlier updates.
+
+    Only rows flagged ``counted`` contribute; context rows already folded into
+    ``prior_sum``/``prior_count`` are skipped so they are not counted twice.
+    """
+    contribution = np.where(counted, values, 0.0)
+    prefix = np.cumsum(contribution) - contribution
+    prefix_count = np.cumsum(counted) - counted
+    starts = positions == 0
+    group_offset = np.maximum.accumulate(np.where(starts, np.arange(len(values)), 0))
+    before = prefix - prefix[group_offset]
+    before_count = prefix_count - prefix_count[group_offset]
+    total = prior_sum[codes] + before
+    count = prior_count[codes] + before_count
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+class DemandFeatureEngine:
+    """Lag, rolling-window and average demand features for every store-item series.
+
+    Features for a day only use sales from earlier days, so the same values
+    are valid for training and for forecasting the next day:
+
+    - demand_lag_1 / demand_lag_7: sales 1 and 7 days earlier
+    - demand_rolling_mean_7 / demand_rolling_std_7: over the previous 7 days
+    - item_avg_quantity: mean daily sales of the series so far
+    - restaurant_avg_revenue: mean daily units sold by the store so far
+      (raw_sales_data carries no prices, so units stand in for revenue)
+
+    ``fit_transform`` computes all rows in one vectorized pass. ``update`` then
+    takes only newly appended days: it reuses the last ``window`` days of each
+    series and running totals, so a daily refresh does not rescan history.
+    Series are expected to have one row per day.
+    """
+
+    def __init__(self, window=7):
+        self.window = window
+        self.tail = None
+        self.series_totals = None
+        self.store_totals = None
+
+    def fit_transform(self, sales_df):
+        """Compute features for a full sales history and keep state for ``update``
+
+        Args:
+            sales_df: DataFrame with date, store, item and sales columns
+
+        Returns:
+            DataFrame with restaurant_id, item_id, order_date and FEATURE_COLUMNS
+        """
+        self.tail = None
+        self.series_totals = None
+        self.store_totals = None
+        return self.update(sales_df)
+
+    def update(self, new_sales_df):
+        """Compute features for newly appended days only"""
+        return self._compute(self._clean(new_sales_df), commit=True)
+
+    def peek(self, rows):
+        """Features for upcoming (date, store, item) rows without appending them.
+
+        Features only depend on earlier days, so no sales are needed; this is
+        what recursive multi-step forecasting feeds the model each step.
+        """
+        rows = rows[["date", "store", "item"]].assign(sales=0)
+        return self._compute(self._clean(rows), commit=False)
+
+    def next_day(self):
+        """Features for the day after each series' last appended day
+
+        These are the lags a next-day forecast needs; they are final already,
+        since features never depend on the day's own sales.
+        """
+        if self.tail is None:
+            raise ValueError("No sales appended yet")
+        last = self.tail.groupby(["store", "item"], as_index=False)["date"].max()
+        return self.peek(last.assign(date=last["date"] + pd.Timedelta(days=1)))
+
+    def _compute(self, new, commit):
+        new["_new"] = True
+        frame = new if self.tail is None else pd.concat([self.tail.assign(_new=False), new], ignore_index=True)
+        frame = frame.sort_values(["store", "item", "date"], kind="mergesort", ignore_index=True)
+
+        series = pd.MultiIndex.from_frame(frame[["store", "item"]])
+        series_index = series.unique()
+        codes = series_index.get_indexer(series)
+        positions = _group_positions(codes)
+        sales = frame["sales"].to_numpy(dtype=np.float64)
+        counted = frame["_new"].to_numpy()
+
+        features = pd.DataFrame({
+            "restaurant_id": frame["store"].to_numpy(),
+            "item_id": frame["item"].to_numpy(),
+            "order_date": frame["date"].to_numpy(),
+        })
+        features["demand_lag_1"] = _lag(sales, positions, 1)
+        features["demand_lag_7"] = _lag(sales, positions, 7)
+        features["demand_rolling_mean_7"], features["demand_rolling_std_7"] = \
+            _trailing_window(sales, positions, self.window)
+
+        prior_sum, prior_count = self._priors(self.series_totals, series_index)
+        features["item_avg_quantity"] = _expanding_mean(sales, codes, positions, counted, prior_sum, prior_count)
+        store_days = pd.MultiIndex.from_frame(frame[["store", "date"]])
+        features["restaurant_avg_revenue"] = self._restaurant_average(new).reindex(store_days).to_numpy()
+        weekday = pd.DatetimeIndex(frame["date"]).dayofweek.to_numpy()
+        features["day_of_week"] = weekday
+        features["is_weekend"] = (weekday >= 5).astype(np.int64)
+
+        if commit:
+            self._update_state(frame, new)
+        return features[counted].reset_index(drop=True)
+
+    def _restaurant_average(self, new):
+        """Average of earlier daily store totals, indexed by (store, date) of the new days"""
+        daily = new.groupby(["store", "date"], sort=True)["sales"].sum()
+        codes, stores = pd.factorize(daily.index.get_level_values("store"), sort=True)
+        prior_sum, prior_count = self._priors(self.store_totals, pd.Index(stores))
+        average = _expanding_mean(
+            daily.to_numpy(dtype=np.float64), codes, _group_positions(codes),
+            np.ones(len(daily), dtype=bool), prior_sum, prior_count,
+        )
+        return pd.Series(average, index=daily.index)
+
+    @staticmethod
+    def _priors(totals, index):
+        if totals is None:
+            return np.zeros(len(index)), np.zeros(len(index))
+        aligned = totals.reindex(index, fill_value=0)
+        return aligned["sum"].to_numpy(dtype=np.float64), aligned["count"].to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _clean(df):
+        clean = df[["date", "store", "item", "sales"]].copy()
+        clean["date"] = pd.to_datetime(clean["date"])
+        return clean
+
+    @staticmethod
+    def _add_totals(totals, additions):
+        return additions if totals is None else totals.add(additions, fill_value=0)
+
+    def _update_state(self, frame, new):
+        series_sums = new.groupby(["store", "item"])["sales"].agg(sum="sum", count="count").astype(np.float64)
+        self.series_totals = self._add_totals(self.series_totals, series_sums)
+        daily = new.groupby(["store", "date"])["sales"].sum()
+        store_sums = daily.groupby(level="store").agg(sum="sum", count="count").astype(np.float64)
+        self.store_totals = self._add_totals(self.store_totals, store_sums)
+
+        # Keep the trailing window of each series as context for the next update
+        positions_from_end = frame.groupby(["store", "item"]).cumcount(ascending=False)
+        self.tail = frame.loc[positions_from_end < self.window, ["date", "store", "item", "sales"]] \
+            .reset_index(drop=True)
@@ -1,79 +1,247 @@
 import os
-from feast import FeatureStore, Entity, Feature, FeatureView, FileSource, ValueType
+import time
+import threading
+from collections import OrderedDict
+from feast import FeatureStore, Entity, FeatureView, Field, FileSource, ValueType
 from feast.types import Float32, Int64
-from datetime import timedelta
+from datetime import datetime, timedelta
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from feast.data_format import ParquetFormat
 import logging
+from .config import Config
 
 logger = logging.getLogger(__name__)
 
+FEATURE_VIEW = "demand_features"
+ONLINE_FEATURES = [
+    "demand_lag_1",
+    "demand_lag_7",
+    "demand_rolling_mean_7",
+    "demand_rolling_std_7",
+    "item_avg_quantity",
+    "restaurant_avg_revenue",
+    "day_of_week",
+    "is_weekend",
+]
+FEATURE_TYPES = {
+    "demand_lag_1": "float32",
+    "demand_lag_7": "float32",
+    "demand_rolling_mean_7": "float32",
+    "demand_rolling_std_7": "float32",
+    "item_avg_quantity": "float32",
+    "restaurant_avg_revenue": "float32",
+    "day_of_week": "int64",
+    "is_weekend": "int64",
+}
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl=60.0, max_size=10_000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
 class FeastFeatureStore:
-    def __init__(self, repo_path):
+    def __init__(self, repo_path, cache_ttl=Config.FEATURE_CACHE_TTL, cache_size=Config.FEATURE_CACHE_SIZE):
         self.repo_path = repo_path
         self.store = None
         self.restaurant_entity = None
         self.item_entity = None
         self.demand_features = None
-        # self._setup_feature_store()
-    
+        # Hive-partitioned by event_date: event_date=2025-01-01/part-*.parquet
+        self.offline_path = os.path.join(repo_path, "data", FEATURE_VIEW)
+        self.online_cache = TTLCache(ttl=cache_ttl, max_size=cache_size)
+
+    def _feast(self):
+        """The Feast store, set up on first use in processes that did not register it (e.g. prediction)"""
+        if self.store is None:
+            self._setup_feature_store()
+        return self.store
+
     def _setup_feature_store(self):
         """Initialize Feast feature store"""
         if not os.path.exists(self.repo_path):
             os.makedirs(self.repo_path)
-        
+
         # Create feature store
         self.store = FeatureStore(repo_path=self.repo_path)
-        
+
         # Define entities
         self.restaurant_entity = Entity(
             name="restaurant_id",
+            join_keys=["restaurant_id"],
             description="Restaurant identifier",
             value_type=ValueType.STRING
         )
-        
+
         self.item_entity = Entity(
-            name="item_id", 
+            name="item_id",
+            join_keys=["item_id"],
             description="Menu item identifier",
             value_type=ValueType.STRING,
         )
-        
+
         # Define feature view
         self.demand_features = FeatureView(
-            name="demand_features",
+            name=FEATURE_VIEW,
             entities=[self.item_entity, self.restaurant_entity],
-            features=[
-                Feature(name="demand_lag_1", dtype=ValueType.FLOAT),
-                Feature(name="demand_lag_7", dtype=ValueType.FLOAT),
-                Feature(name="demand_rolling_mean_7", dtype=ValueType.FLOAT),
-                Feature(name="demand_rolling_std_7", dtype=ValueType.FLOAT),
-                Feature(name="item_avg_quantity", dtype=ValueType.FLOAT),
-                Feature(name="restaurant_avg_revenue", dtype=ValueType.FLOAT),
-                Feature(name="day_of_week", dtype=ValueType.INT64),
-                Feature(name="is_weekend", dtype=ValueType.INT64)
+            schema=[
+                Field(name="demand_lag_1", dtype=Float32),
+                Field(name="demand_lag_7", dtype=Float32),
+                Field(name="demand_rolling_mean_7", dtype=Float32),
+                Field(name="demand_rolling_std_7", dtype=Float32),
+                Field(name="item_avg_quantity", dtype=Float32),
+                Field(name="restaurant_avg_revenue", dtype=Float32),
+                Field(name="day_of_week", dtype=Int64),
+                Field(name="is_weekend", dtype=Int64)
             ],
             source=FileSource(
-                path=f"{self.repo_path}/data/data.csv",
-                event_timestamp_column="event_timestamp",
+                path=self.offline_path,
+                file_format=ParquetFormat(),
+                timestamp_field="event_timestamp",
             ),
+            online=True,
             ttl=timedelta(days=365),
         )
-        
+
         # Register entities and feature view with Feast
         self.store.apply([self.restaurant_entity, self.item_entity, self.demand_features])
         logger.info("Feature store setup completed")
-    
+
     def store_features(self, features_df):
-        """Store features in Feast"""
-        # Add event timestamp
-        features_df['event_timestamp'] = pd.to_datetime(features_df['order_date'])
-        # Ingest the DataFrame into the feature view
-        self.store.ingest(self.demand_features, features_df)
-        logger.info(f"Stored {len(features_df)} feature rows in Feast")
-    
+        """Append feature rows to the Parquet offline source of demand_features
+
+        Rows are written partitioned by event date. Partitions present in
+        ``features_df`` are replaced and all others are left alone, so
+        re-running a day is idempotent and new days are a cheap append.
+
+        Args:
+            features_df: DataFrame with restaurant_id, item_id, order_date (or
+                event_timestamp) and the demand_features columns
+        """
+        df = features_df.copy()
+        if 'event_timestamp' not in df:
+            df['event_timestamp'] = pd.to_datetime(df['order_date'])
+        df['event_timestamp'] = pd.to_datetime(df['event_timestamp'])
+        df['restaurant_id'] = df['restaurant_id'].astype(str)
+        df['item_id'] = df['item_id'].astype(str)
+        df = df.astype({name: dtype for name, dtype in FEATURE_TYPES.items() if name in df})
+        df['event_date'] = df['event_timestamp'].dt.strftime('%Y-%m-%d')
+
+        columns = ['restaurant_id', 'item_id', 'event_timestamp'] + \
+            [name for name in FEATURE_TYPES if name in df] + ['event_date']
+        table = pa.Table.from_pandas(df[columns], preserve_index=False)
+
+        os.makedirs(self.offline_path, exist_ok=True)
+        ds.write_dataset(
+            table,
+            self.offline_path,
+            format="parquet",
+            partitioning=ds.partitioning(pa.schema([("event_date", pa.string())]), flavor="hive"),
+            basename_template=f"part-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{{i}}.parquet",
+            existing_data_behavior="delete_matching",
+        )
+        logger.info(f"Stored {len(df)} feature rows in {df['event_date'].nunique()} "
+                    f"partitions of {self.offline_path}")
+
+    def read_offline_features(self, start_date=None, end_date=None, columns=None):
+        """Read the Parquet offline source, pruning partitions outside the date range"""
+        dataset = ds.dataset(self.offline_path, format="parquet", partitioning="hive")
+        condition = None
+        if start_date is not None:
+            condition = ds.field("event_date") >= pd.Timestamp(start_date).strftime('%Y-%m-%d')
+        if end_date is not None:
+            upper = ds.field("event_date") <= pd.Timestamp(end_date).strftime('%Y-%m-%d')
+            condition = upper if condition is None else condition & upper
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+    def materialize(self, end_date=None):
+        """Push the latest demand_features rows from the offline source into the online store.
+
+        Incremental: Feast only loads rows newer than the previous materialization.
+        """
+        end_date = end_date or datetime.now()
+        start = time.perf_counter()
+        self._feast().materialize_incremental(end_date=end_date, feature_views=[FEATURE_VIEW])
+        # Cached vectors may predate the newly materialized values
+        self.online_cache.clear()
+        logger.info(f"Materialized {FEATURE_VIEW} up to {end_date} in {time.perf_counter() - start:.2f}s")
+
     def get_features(self, entity_df):
-        """Retrieve features for prediction"""
-        feature_vector = self.store.get_historical_features(
+        """Retrieve point-in-time correct features for training (offline join)"""
+        feature_vector = self._feast().get_historical_features(
             entity_df=entity_df,
             features=["demand_features:demand_lag_1", "demand_features:demand_lag_7"]
         )
-        return feature_vector.to_df()
\ No newline at end of file
+        return feature_vector.to_df()
+
+    def get_online_features(self, entities, features=ONLINE_FEATURES):
+        """Latest feature values for many (restaurant_id, item_id) pairs, for inference.
+
+        Entities already in the TTL cache are served from memory; the rest are
+        fetched from the online store in a single batched lookup.
+
+        Args:
+            entities: iterable of (restaurant_id, item_id) pairs
+            features: feature names of the demand_features view
+
+        Returns:
+            DataFrame with restaurant_id, item_id and one column per feature,
+            in the order of ``entities``
+        """
+        keys = [(str(restaurant_id), str(item_id)) for restaurant_id, item_id in entities]
+        features = list(features)
+        cached = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            vector = self.online_cache.get((key, tuple(features)))
+            if vector is None:
+                missing.append(key)
+            else:
+                cached[key] = vector
+
+        if missing:
+            response = self._feast().get_online_features(
+                features=[f"{FEATURE_VIEW}:{name}" for name in features],
+                entity_rows=[{"restaurant_id": r, "item_id": i} for r, i in missing],
+            ).to_dict()
+            for row, key in enumerate(missing):
+                vector = {name: response[name][row] for name in features}
+                self.online_cache.set((key, tuple(features)), vector)
+                cached[key] = vector
+            logger.info(f"Fetched online features for {len(missing)} entities "
+                        f"({len(keys) - len(missing)} from cache)")
+
+        return pd.DataFrame(
+            [{"restaurant_id": r, "item_id": i, **cached[(r, i)]} for r, i in keys],
+            columns=["restaurant_id", "item_id"] + features,
+        )
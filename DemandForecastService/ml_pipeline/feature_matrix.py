@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+ENTITY_KEYS = ["restaurant_id", "item_id"]
+LAG_FEATURES = [
+    "demand_lag_1",
+    "demand_lag_7",
+    "demand_rolling_mean_7",
+    "demand_rolling_std_7",
+    "item_avg_quantity",
+    "restaurant_avg_revenue",
+]
+# Column order of the prediction feature matrix; models are trained on the same order
+FEATURE_NAMES = [
+    "restaurant_code",
+    "item_code",
+    "day_of_week",
+    "month",
+    "is_weekend",
+    *LAG_FEATURES,
+]
+
+
+class StableEncoder:
+    """Dictionary encoding that is identical in every process.
+
+    Codes are positions in the sorted vocabulary seen at fit time (unlike
+    built-in hash(), which is salted per process). Unseen values map to -1.
+    """
+
+    def __init__(self, vocabulary=()):
+        self.vocabulary = sorted({str(value) for value in vocabulary})
+        self._index = pd.Index(self.vocabulary)
+
+    def transform(self, values):
+        return self._index.get_indexer(pd.Index([str(value) for value in values])).astype(np.int32)
+
+    def to_dict(self):
+        return {"vocabulary": self.vocabulary}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["vocabulary"])
+
+
+class PredictionFeatureBuilder:
+    """Builds the feature matrix for all entities x forecast dates in one call.
+
+    The result is a C-contiguous float32 array with one row per (entity, date),
+    entity-major, so a tabular model can score every restaurant in a single
+    predict call. Lag features are the latest values from the feature store,
+    the features of the day after each series' last sale; every forecast date
+    reuses them, only the calendar columns change.
+    """
+
+    def __init__(self, restaurant_encoder=None, item_encoder=None, feature_store=None):
+        self.restaurant_encoder = restaurant_encoder or StableEncoder()
+        self.item_encoder = item_encoder or StableEncoder()
+        self.feature_store = feature_store
+
+    @classmethod
+    def fit(cls, entities, feature_store=None):
+        """Builder whose encoders know every (restaurant_id, item_id) in ``entities``"""
+        entities = pd.DataFrame(entities, columns=ENTITY_KEYS)
+        return cls(StableEncoder(entities["restaurant_id"]), StableEncoder(entities["item_id"]), feature_store)
+
+    def to_dict(self):
+        return {
+            "feature_names": FEATURE_NAMES,
+            "restaurant_encoder": self.restaurant_encoder.to_dict(),
+            "item_encoder": self.item_encoder.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data, feature_store=None):
+        if data.get("feature_names", FEATURE_NAMES) != FEATURE_NAMES:
+            raise ValueError(f"Model was trained on features {data['feature_names']}, "
+                             f"expected {FEATURE_NAMES}; retrain it")
+        return cls(
+            StableEncoder.from_dict(data["restaurant_encoder"]),
+            StableEncoder.from_dict(data["item_encoder"]),
+            feature_store,
+        )
+
+    def _lag_features(self, entities, lag_features):
+        if lag_features is None:
+            if self.feature_store is None:
+                raise ValueError("No lag features given and no feature store to fetch them from")
+            lag_features = self.feature_store.get_online_features(
+                entities.itertuples(index=False, name=None), features=LAG_FEATURES
+            )
+        lag_features = lag_features.astype({key: str for key in ENTITY_KEYS})
+        joined = entities.astype(str).merge(
+            lag_features[ENTITY_KEYS + LAG_FEATURES].drop_duplicates(ENTITY_KEYS, keep="last"),
+            on=ENTITY_KEYS, how="left",
+        )
+        return joined[LAG_FEATURES].to_numpy(dtype=np.float32)
+
+    def build(self, entities, forecast_dates, lag_features=None):
+        """Feature matrix for every entity on every forecast date
+
+        Args:
+            entities: (restaurant_id, item_id) pairs or a DataFrame with those columns
+            forecast_dates: dates to forecast, in horizon order
+            lag_features: DataFrame with restaurant_id, item_id and LAG_FEATURES
+                for the first forecast date, e.g. DemandFeatureEngine.next_day();
+                fetched from the feature store's online path when not given.
+                Missing entities get NaN.
+
+        Returns:
+            (matrix, index): float32 array of shape (entities * dates, len(FEATURE_NAMES))
+            and a DataFrame with restaurant_id, item_id, forecast_date and
+            horizon_day (1 for the first forecast date) per row
+        """
+        entities = pd.DataFrame(entities, columns=ENTITY_KEYS).reset_index(drop=True)
+        dates = pd.DatetimeIndex(pd.to_datetime(list(forecast_dates)))
+        n_entities, n_dates = len(entities), len(dates)
+
+        matrix = np.empty((n_entities * n_dates, len(FEATURE_NAMES)), dtype=np.float32)
+        # Per-entity columns repeat over dates, calendar columns tile over entities
+        matrix[:, 0] = np.repeat(self.restaurant_encoder.transform(entities["restaurant_id"]), n_dates)
+        matrix[:, 1] = np.repeat(self.item_encoder.transform(entities["item_id"]), n_dates)
+        weekday = dates.dayofweek.to_numpy()
+        matrix[:, 2] = np.tile(weekday, n_entities)
+        matrix[:, 3] = np.tile(dates.month.to_numpy(), n_entities)
+        matrix[:, 4] = np.tile(weekday >= 5, n_entities)
+        lag_start = FEATURE_NAMES.index(LAG_FEATURES[0])
+        matrix[:, lag_start:lag_start + len(LAG_FEATURES)] = np.repeat(
+            self._lag_features(entities, lag_features), n_dates, axis=0
+        )
+
+        index = pd.DataFrame({
+            "restaurant_id": np.repeat(entities["restaurant_id"].to_numpy(), n_dates),
+            "item_id": np.repeat(entities["item_id"].to_numpy(), n_dates),
+            "forecast_date": np.tile(dates.date, n_entities),
+            "horizon_day": np.tile(np.arange(1, n_dates + 1), n_entities),
+        })
+        return matrix, index
+
+    def rows(self, features):
+        """Feature matrix with one row per DemandFeatureEngine row (each on its own date)
+
+        Used for training global models and for each step of recursive forecasting.
+        """
+        dates = pd.DatetimeIndex(features["order_date"])
+        weekday = dates.dayofweek.to_numpy()
+        matrix = np.empty((len(features), len(FEATURE_NAMES)), dtype=np.float32)
+        matrix[:, 0] = self.restaurant_encoder.transform(features["restaurant_id"])
+        matrix[:, 1] = self.item_encoder.transform(features["item_id"])
+        matrix[:, 2] = weekday
+        matrix[:, 3] = dates.month.to_numpy()
+        matrix[:, 4] = weekday >= 5
+        lag_start = FEATURE_NAMES.index(LAG_FEATURES[0])
+        matrix[:, lag_start:lag_start + len(LAG_FEATURES)] = features[LAG_FEATURES].to_numpy(dtype=np.float32)
+        return matrix
@@ -0,0 +1,310 @@
+import re
+import logging
+from itertools import groupby
+from operator import attrgetter
+from datetime import datetime, time, timedelta
+import pandas as pd
+from sqlalchemy import bindparam, func, inspect, text
+from sqlalchemy.orm import sessionmaker
+from .models import Base, PredictionResults, ForecastRun, FORECASTS_RUN_INDEX
+from .utils import LOG
+
+logger = logging.getLogger(__name__)
+
+STAGED, CURRENT, RETIRED = "staged", "current", "retired"
+# Rows per insert transaction while a run is staged
+STAGE_CHUNK_ROWS = 10_000
+# Stores per IN (...) list, well below SQL Server's 2100 parameters
+STORE_CHUNK = 500
+PARTITION_DIALECTS = ("postgresql", "mysql")
+FORECAST_COLUMNS = ["store", "item", "forecast_date", "yhat", "yhat_lower", "yhat_upper", "model_version"]
+
+# PostgreSQL can only partition a table when creating it; the key must include created_at
+POSTGRES_PARTITIONED_TABLE = """
+CREATE TABLE forecasts (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    created_at TIMESTAMP NOT NULL,
+    store INTEGER,
+    item INTEGER,
+    forecast_date DATE,
+    yhat DOUBLE PRECISION,
+    yhat_lower DOUBLE PRECISION,
+    yhat_upper DOUBLE PRECISION,
+    model_version VARCHAR,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+# MySQL can rebuild an existing table; rows already stored land in pmax until it is split by day
+MYSQL_PARTITION_TABLE = [
+    "ALTER TABLE forecasts MODIFY created_at DATETIME NOT NULL, DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)",
+    "ALTER TABLE forecasts PARTITION BY RANGE (TO_DAYS(created_at)) (PARTITION pmax VALUES LESS THAN MAXVALUE)",
+]
+
+
+class ForecastTable:
+    """The forecasts table with a current-run pointer per store, retention and day partitions.
+
+    Publishing a run first stages it: the run is registered in forecast_runs
+    as "staged" and its rows are inserted in chunks. Readers only serve rows
+    of their store's "current" run, so they do not see it yet. swap() then
+    makes it current for all its stores in one short transaction, so a reader
+    sees either the previous run or the complete new one.
+
+    compact() deletes the runs beyond the retention limits. With
+    ``partitioned`` (PostgreSQL and MySQL) forecasts is range-partitioned by
+    created_at day, and days without any kept run are dropped as whole
+    partitions instead of deleting their rows.
+    """
+
+    def __init__(self, engine, partitioned=False):
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine)
+        self.dialect = self.engine.dialect.name
+        self.partitioned = partitioned and self.dialect in PARTITION_DIALECTS
+        if partitioned and not self.partitioned:
+            LOG.info(f"⚠️  Partitioned forecasts are not supported on {self.dialect}, retention deletes rows")
+
+    def create(self):
+        """Create the tables and the run index, and register runs stored before forecast_runs existed"""
+        forecasts_exist = inspect(self.engine).has_table(PredictionResults.__tablename__)
+        if self.partitioned and self.dialect == "postgresql" and not forecasts_exist:
+            with self.engine.begin() as conn:
+                conn.execute(text(POSTGRES_PARTITIONED_TABLE))
+        Base.metadata.create_all(bind=self.engine)
+        FORECASTS_RUN_INDEX.create(bind=self.engine, checkfirst=True)
+
+        if self.partitioned and not self._is_partitioned():
+            if self.dialect == "mysql":
+                LOG.info("🧱 Partitioning the forecasts table by created_at day")
+                with self.engine.begin() as conn:
+                    for statement in MYSQL_PARTITION_TABLE:
+                        conn.execute(text(statement))
+            else:
+                LOG.info("⚠️  The existing forecasts table is not partitioned, retention deletes rows")
+                self.partitioned = False
+        self._register_existing_runs()
+
+    def _register_existing_runs(self):
+        """Backfill forecast_runs from forecasts, with each store's newest run as current"""
+        with self.Session() as session:
+            if session.query(ForecastRun.store).first() is not None:
+                return
+            runs = session.query(
+                PredictionResults.store, PredictionResults.created_at,
+                func.count(), func.max(PredictionResults.model_version),
+            ).filter(PredictionResults.created_at.isnot(None)).group_by(
+                PredictionResults.store, PredictionResults.created_at
+            ).all()
+            if not runs:
+                return
+            newest = {}
+            for store, created_at, _, _ in runs:
+                newest[store] = max(newest.get(store, created_at), created_at)
+            session.add_all([
+                ForecastRun(store=store, created_at=created_at, row_count=row_count, model_version=model_version,
+                            status=CURRENT if newest[store] == created_at else RETIRED)
+                for store, created_at, row_count, model_version in runs
+            ])
+            session.commit()
+        LOG.info(f"Registered {len(runs)} existing forecast runs of {len(newest)} stores")
+
+    def publish(self, predictions):
+        """Stage a predictions frame as a new run and make it current for its stores
+
+        Returns:
+            created_at of the run, which readers use as its run id
+        """
+        # One timestamp for the whole run, readers use it to identify the run
+        created_at = datetime.utcnow()
+        stores = self.stage(predictions, created_at)
+        self.swap(created_at, stores)
+        return created_at
+
+    def stage(self, predictions, created_at):
+        """Register a run as staged and insert its rows; readers do not see it until swap()
+
+        Returns:
+            stores of the run
+        """
+        rows = predictions[FORECAST_COLUMNS].copy()
+        rows["store"] = rows["store"].astype(int)
+        rows["item"] = rows["item"].astype(int)
+        rows["forecast_date"] = pd.to_datetime(rows["forecast_date"]).dt.date
+        for column in ("yhat", "yhat_lower", "yhat_upper"):
+            rows[column] = rows[column].astype(float)
+        runs = rows.groupby("store").agg(row_count=("item", "size"), model_version=("model_version", "first"))
+
+        if self.partitioned:
+            self._ensure_partition(created_at.date())
+        with self.Session() as session:
+            # Registered before any row is written, so compact() can clean up a run that never finishes
+            session.add_all([
+                ForecastRun(store=int(store), created_at=created_at, row_count=int(run.row_count),
+                            model_version=run.model_version, status=STAGED)
+                for store, run in runs.iterrows()
+            ])
+            session.commit()
+            records = rows.to_dict("records")
+            for start in range(0, len(records), STAGE_CHUNK_ROWS):
+                session.bulk_save_objects([
+                    PredictionResults(**record, created_at=created_at)
+                    for record in records[start:start + STAGE_CHUNK_ROWS]
+                ])
+                session.commit()
+        return [int(store) for store in runs.index]
+
+    def swap(self, created_at, stores):
+        """Make a staged run the current run of its stores, in one transaction"""
+        runs = ForecastRun.__table__
+        with self.engine.begin() as conn:
+            for start in range(0, len(stores), STORE_CHUNK):
+                conn.execute(
+                    runs.update()
+                    .where(runs.c.store.in_(stores[start:start + STORE_CHUNK]), runs.c.status == CURRENT)
+                    .values(status=RETIRED)
+                )
+            conn.execute(
+                runs.update()
+                .where(runs.c.created_at == created_at, runs.c.status == STAGED)
+                .values(status=CURRENT)
+            )
+        LOG.info(f"🔀 Forecast run {created_at.isoformat()} is current for {len(stores)} stores")
+
+    def compact(self, keep_runs=None, keep_days=None, now=None):
+        """Delete the runs of each store beyond the retention limits
+
+        A store's current run is always kept. Of the others, a run is deleted
+        when it is not among the store's ``keep_runs`` newest published runs or
+        is older than ``keep_days`` days (a falsy limit is not applied). Staged
+        runs older than the current one never finished and are deleted too.
+
+        Returns:
+            dict with the number of expired runs, deleted rows and dropped partitions
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=keep_days) if keep_days else None
+        with self.Session() as session:
+            runs = session.query(ForecastRun.store, ForecastRun.created_at, ForecastRun.status).order_by(
+                ForecastRun.store, ForecastRun.created_at.desc()
+            ).all()
+
+        expired, kept = [], []
+        for _, store_runs in groupby(runs, key=attrgetter("store")):
+            store_runs = list(store_runs)
+            current = next((run.created_at for run in store_runs if run.status == CURRENT), None)
+            published = 0
+            for run in store_runs:
+                too_old = cutoff is not None and run.created_at < cutoff
+                if run.status == CURRENT:
+                    published += 1
+                    kept.append(run)
+                elif run.status == STAGED:
+                    # Staged after the current run: still being written
+                    abandoned = current is not None and run.created_at < current
+                    (expired if abandoned or too_old else kept).append(run)
+                else:
+                    published += 1
+                    (expired if too_old or (keep_runs and published > keep_runs) else kept).append(run)
+
+        dropped_before, dropped = None, 0
+        if self.partitioned and expired:
+            dropped_before, dropped = self._drop_expired_partitions(min((run.created_at for run in kept), default=None), now)
+
+        forecasts, registry = PredictionResults.__table__, ForecastRun.__table__
+        deleted_rows = 0
+        with self.engine.begin() as conn:
+            rows_to_delete = [
+                {"run_store": run.store, "run_created_at": run.created_at} for run in expired
+                if dropped_before is None or run.created_at >= dropped_before
+            ]
+            if rows_to_delete:
+                deleted_rows = conn.execute(
+                    forecasts.delete().where(forecasts.c.store == bindparam("run_store"),
+                                             forecasts.c.created_at == bindparam("run_created_at")),
+                    rows_to_delete,
+                ).rowcount
+            if expired:
+                conn.execute(
+                    registry.delete().where(registry.c.store == bindparam("run_store"),
+                                            registry.c.created_at == bindparam("run_created_at")),
+                    [{"run_store": run.store, "run_created_at": run.created_at} for run in expired],
+                )
+
+        summary = {
+            "expired_runs": len(expired),
+            "kept_runs": len(kept),
+            "deleted_rows": max(deleted_rows, 0),
+            "dropped_partitions": dropped,
+        }
+        LOG.info(f"🧹 Forecast retention: {summary}")
+        return summary
+
+    def _partition_name(self, day):
+        prefix = "forecasts_p" if self.dialect == "postgresql" else "p"
+        return f"{prefix}{day:%Y%m%d}"
+
+    def _partitions(self):
+        """Day partitions of forecasts, {day: partition name}"""
+        if self.dialect == "postgresql":
+            query = ("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                     "WHERE i.inhparent = 'forecasts'::regclass")
+        else:
+            query = ("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                     "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'forecasts' AND PARTITION_NAME IS NOT NULL")
+        with self.engine.connect() as conn:
+            names = [row[0] for row in conn.execute(text(query))]
+        days = {}
+        for name in names:
+            match = re.search(r"p(\d{8})$", name)
+            if match:
+                days[datetime.strptime(match.group(1), "%Y%m%d").date()] = name
+        return days
+
+    def _is_partitioned(self):
+        if self.dialect == "postgresql":
+            query = ("SELECT COUNT(*) FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+                     "WHERE c.relname = 'forecasts'")
+        else:
+            query = ("SELECT COUNT(*) FROM information_schema.PARTITIONS "
+                     "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'forecasts' AND PARTITION_NAME IS NOT NULL")
+        with self.engine.connect() as conn:
+            return conn.execute(text(query)).scalar() > 0
+
+    def _ensure_partition(self, day):
+        """Create the partition for a created_at day before rows are inserted into it"""
+        partitions = self._partitions()
+        if day in partitions:
+            return
+        name, upper = self._partition_name(day), day + timedelta(days=1)
+        if self.dialect == "postgresql":
+            statement = (f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF forecasts "
+                         f"FOR VALUES FROM ('{day.isoformat()}') TO ('{upper.isoformat()}')")
+        elif partitions and max(partitions) > day:
+            # MySQL ranges only grow at the end; the day's rows go to a later partition
+            return
+        else:
+            statement = (f"ALTER TABLE forecasts REORGANIZE PARTITION pmax INTO ("
+                         f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{upper.isoformat()}')), "
+                         f"PARTITION pmax VALUES LESS THAN MAXVALUE)")
+        with self.engine.begin() as conn:
+            conn.execute(text(statement))
+
+    def _drop_expired_partitions(self, oldest_kept, now):
+        """Drop day partitions, oldest first, that end before the oldest kept run
+
+        Returns:
+            (datetime before which all rows are gone, so runs before it need no
+            DELETE, or None; number of dropped partitions)
+        """
+        dropped_before, dropped = None, 0
+        for day, name in sorted(self._partitions().items()):
+            upper = datetime.combine(day + timedelta(days=1), time())
+            if day >= now.date() or (oldest_kept is not None and upper > oldest_kept):
+                break
+            statement = f"DROP TABLE {name}" if self.dialect == "postgresql" \
+                else f"ALTER TABLE forecasts DROP PARTITION {name}"
+            with self.engine.begin() as conn:
+                conn.execute(text(statement))
+            dropped += 1
+            dropped_before = upper
+        return dropped_before, dropped
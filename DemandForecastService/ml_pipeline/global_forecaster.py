@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from .demand_features import DemandFeatureEngine
+from .feature_matrix import PredictionFeatureBuilder
+from .utils import LOG
+
+MODEL_VERSION = "global_xgb_v1"
+
+DEFAULT_PARAMS = {
+    "n_estimators": 500,
+    "max_depth": 8,
+    "learning_rate": 0.05,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "min_child_weight": 5,
+    "objective": "reg:squarederror",
+    # Histogram splits over all cores: fast enough to fit every series at once
+    "tree_method": "hist",
+    "n_jobs": -1,
+    "early_stopping_rounds": 30,
+}
+
+
+class GlobalXGBForecaster:
+    """One gradient-boosted model for every store-item series.
+
+    Trained on one-step-ahead rows (lag, rolling and calendar features ->
+    next-day sales) of all series together. Forecasting is recursive: each
+    step scores the next day of every series in a single predict call, then
+    appends those predictions as sales so the next step's lags include them.
+    Intervals come from the validation residual quantiles, widened with the
+    square root of the horizon step.
+
+    With a feature store, ``score`` reuses the one-step model for the whole
+    horizon from the latest materialized lag features instead (see
+    PredictionFeatureBuilder.build).
+    """
+
+    def __init__(self, params=None, interval_width=0.95, validation_days=28, feature_store=None):
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.interval_width = interval_width
+        self.validation_days = validation_days
+        self.feature_store = feature_store
+        self.model = None
+        self.builder = None
+        self.residual_quantiles = (0.0, 0.0)
+        self.metrics = {}
+
+    def fit(self, sales_df):
+        """Train on a sales history with date, store, item and sales columns"""
+        start = time.perf_counter()
+        sales = sales_df[["date", "store", "item", "sales"]].copy()
+        sales["date"] = pd.to_datetime(sales["date"])
+        features = DemandFeatureEngine().fit_transform(sales)
+        target = features[["restaurant_id", "item_id", "order_date"]].merge(
+            sales.rename(columns={"store": "restaurant_id", "item": "item_id", "date": "order_date"}),
+            on=["restaurant_id", "item_id", "order_date"], how="left",
+        )["sales"].to_numpy(dtype=np.float32)
+
+        self.builder = PredictionFeatureBuilder.fit(features[["restaurant_id", "item_id"]].drop_duplicates(),
+                                                    self.feature_store)
+        X = self.builder.rows(features)
+
+        # Time-based split: the last validation_days of every series
+        cutoff = features["order_date"].max() - pd.Timedelta(days=self.validation_days)
+        valid = (features["order_date"] > cutoff).to_numpy()
+        if not valid.any() or valid.all():
+            valid = np.zeros(len(X), dtype=bool)
+
+        params = dict(self.params)
+        eval_set = None
+        if valid.any():
+            eval_set = [(X[valid], target[valid])]
+        else:
+            params.pop("early_stopping_rounds", None)
+        self.model = xgb.XGBRegressor(**params)
+        self.model.fit(X[~valid], target[~valid], eval_set=eval_set, verbose=False)
+
+        if valid.any():
+            residuals = target[valid] - self.model.predict(X[valid])
+            alpha = (1 - self.interval_width) / 2
+            self.residual_quantiles = tuple(float(q) for q in np.quantile(residuals, [alpha, 1 - alpha]))
+            self.metrics = {
+                "val_mae": float(np.mean(np.abs(residuals))),
+                "val_rmse": float(np.sqrt(np.mean(residuals ** 2))),
+            }
+        self.metrics["train_rows"] = int((~valid).sum())
+        self.metrics["series"] = len(features[["restaurant_id", "item_id"]].drop_duplicates())
+        self.metrics["fit_seconds"] = time.perf_counter() - start
+        LOG.info(f"🌲 Global XGBoost trained on {len(X):,} rows of {self.metrics['series']} series "
+                 f"in {self.metrics['fit_seconds']:.1f}s")
+        return self
+
+    def predict(self, sales_df, horizon=15):
+        """Recursive multi-step forecast of every series in ``sales_df``
+
+        Returns:
+            DataFrame with store, item, forecast_date, yhat, yhat_lower,
+            yhat_upper and model_version, ``horizon`` rows per series
+        """
+        sales = sales_df[["date", "store", "item", "sales"]].copy()
+        sales["date"] = pd.to_datetime(sales["date"])
+        engine = DemandFeatureEngine()
+        engine.fit_transform(sales)
+
+        series = sales[["store", "item"]].drop_duplicates().reset_index(drop=True)
+        last_date = sales["date"].max()
+        forecasts = []
+        for step in range(1, horizon + 1):
+            day = series.assign(date=last_date + pd.Timedelta(days=step))
+            features = engine.peek(day)
+            yhat = np.clip(self.model.predict(self.builder.rows(features)), 0, None)
+            # Feed the predictions back as that day's sales for the next step's lags
+            engine.update(pd.DataFrame({
+                "date": features["order_date"], "store": features["restaurant_id"],
+                "item": features["item_id"], "sales": yhat,
+            }))
+            forecasts.append(self._forecast_frame(
+                features["restaurant_id"], features["item_id"], features["order_date"].dt.date, yhat, step,
+            ))
+        predictions = pd.concat(forecasts, ignore_index=True)
+        predictions["model_version"] = MODEL_VERSION
+        return predictions
+
+    def score(self, matrix, index):
+        """Forecast a PredictionFeatureBuilder.build matrix in one predict call
+
+        The model is one-step: every day is scored from the lag features of the
+        first forecast date, so only the calendar columns change along the
+        horizon. Cheaper than ``predict`` (no history to replay) and less
+        accurate further out; intervals still widen with the horizon day.
+
+        Returns:
+            DataFrame with the same columns as ``predict``, one row per matrix row
+        """
+        yhat = np.clip(self.model.predict(matrix), 0, None)
+        predictions = self._forecast_frame(index["restaurant_id"], index["item_id"], index["forecast_date"],
+                                           yhat, index["horizon_day"].to_numpy())
+        predictions["model_version"] = MODEL_VERSION
+        return predictions
+
+    def _forecast_frame(self, stores, items, forecast_dates, yhat, step):
+        """Predictions with residual-quantile bounds widened by sqrt(step)"""
+        low, high = self.residual_quantiles
+        spread = np.sqrt(step)
+        return pd.DataFrame({
+            "store": np.asarray(stores).astype(int),
+            "item": np.asarray(items).astype(int),
+            "forecast_date": np.asarray(forecast_dates),
+            "yhat": yhat.astype(np.float64),
+            "yhat_lower": np.clip(yhat + low * spread, 0, None).astype(np.float64),
+            "yhat_upper": np.clip(yhat + high * spread, 0, None).astype(np.float64),
+        })
+
+    def metadata(self):
+        """Everything besides the booster needed to predict: encoders and interval residuals"""
+        return {
+            "feature_builder": self.builder.to_dict(),
+            "residual_quantiles": list(self.residual_quantiles),
+            "interval_width": self.interval_width,
+            "params": self.params,
+        }
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.model.save_model(os.path.join(path, "model.json"))
+        with open(os.path.join(path, "metadata.json"), "w") as f:
+            json.dump(self.metadata(), f)
+
+    @classmethod
+    def from_metadata(cls, model, metadata, feature_store=None):
+        """Rebuild a forecaster from a trained XGBRegressor and ``metadata()``
+
+        The saved builder keeps the training encoders; ``feature_store`` is where
+        it fetches lag features for ``score``.
+        """
+        forecaster = cls(params=metadata["params"], interval_width=metadata["interval_width"],
+                         feature_store=feature_store)
+        forecaster.builder = PredictionFeatureBuilder.from_dict(metadata["feature_builder"], feature_store)
+        forecaster.residual_quantiles = tuple(metadata["residual_quantiles"])
+        forecaster.model = model
+        return forecaster
+
+    @classmethod
+    def load(cls, path, feature_store=None):
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+        model = xgb.XGBRegressor()
+        model.load_model(os.path.join(path, "model.json"))
+        return cls.from_metadata(model, metadata, feature_store)
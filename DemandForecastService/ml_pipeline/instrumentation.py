@@ -0,0 +1,228 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from .utils import LOG
+
+# Latency buckets (seconds) for API requests and per-series work
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Pipeline stages run for seconds to hours
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        missing = set(self.labelnames) - labels.keys()
+        if missing:
+            raise ValueError(f"Missing labels {sorted(missing)} for metric {self.name}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _format_labels(self.labelnames + ("le",), key + (le,))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_DURATION = REGISTRY.histogram(
+    "pipeline_stage_duration_seconds", "Duration of ML pipeline stages", ["pipeline", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_ROWS = REGISTRY.counter(
+    "pipeline_stage_rows_total", "Rows processed by ML pipeline stages", ["pipeline", "stage"]
+)
+STAGE_ROWS_PER_SECOND = REGISTRY.gauge(
+    "pipeline_stage_rows_per_second", "Throughput of the last run of each ML pipeline stage", ["pipeline", "stage"]
+)
+STAGE_FAILURES = REGISTRY.counter(
+    "pipeline_stage_failures_total", "ML pipeline stages that raised", ["pipeline", "stage"]
+)
+SERIES_DURATION = REGISTRY.histogram(
+    "pipeline_series_duration_seconds", "Per store-item series fit/predict time", ["pipeline", "phase"]
+)
+SERIES_FAILURES = REGISTRY.counter(
+    "pipeline_series_failures_total", "Store-item series that failed", ["pipeline"]
+)
+SERIES_FALLBACKS = REGISTRY.counter(
+    "pipeline_series_fallbacks_total", "Store-item series forecast by the seasonal-naive fallback",
+    ["pipeline", "reason"]
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "API request latency", ["method", "route", "status"]
+)
+
+
+# Objects with on_span_start(span)/on_span_end(span), e.g. the profiler's memory tracker
+_span_listeners = []
+
+
+def add_span_listener(listener):
+    _span_listeners.append(listener)
+
+
+def remove_span_listener(listener):
+    if listener in _span_listeners:
+        _span_listeners.remove(listener)
+
+
+class Span:
+    """Timing of one pipeline stage. Set ``rows`` inside the block to record throughput."""
+
+    def __init__(self, pipeline, stage):
+        self.pipeline = pipeline
+        self.stage = stage
+        self.rows = None
+        self.duration = None
+        self.fields = {}
+
+
+@contextmanager
+def span(pipeline, stage, **fields):
+    """Time a pipeline stage, record it in /metrics and log it with structlog
+
+    Usage:
+        with span("prediction", "store_predictions") as s:
+            store(predictions)
+            s.rows = len(predictions)
+    """
+    current = Span(pipeline, stage)
+    current.fields.update(fields)
+    for listener in list(_span_listeners):
+        listener.on_span_start(current)
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield current
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        for listener in list(_span_listeners):
+            listener.on_span_end(current)
+        STAGE_DURATION.observe(current.duration, pipeline=pipeline, stage=stage)
+        event = dict(current.fields, pipeline=pipeline, stage=stage,
+                     duration_s=round(current.duration, 4), failed=failed)
+        if failed:
+            STAGE_FAILURES.inc(pipeline=pipeline, stage=stage)
+        if current.rows is not None:
+            STAGE_ROWS.inc(current.rows, pipeline=pipeline, stage=stage)
+            event["rows"] = current.rows
+            if current.duration > 0:
+                rate = current.rows / current.duration
+                STAGE_ROWS_PER_SECOND.set(rate, pipeline=pipeline, stage=stage)
+                event["rows_per_sec"] = round(rate, 1)
+        LOG.info("pipeline_span", **event)
+
+
+@contextmanager
+def series_timer(pipeline, phase):
+    """Record per-series work in a histogram only; there are too many series to log each one"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        SERIES_DURATION.observe(time.perf_counter() - start, pipeline=pipeline, phase=phase)
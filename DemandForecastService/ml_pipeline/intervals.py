@@ -0,0 +1,78 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+# full: Prophet's 1000 simulated paths; reduced: fewer paths; analytic: closed-form
+# normal approximation; off: no intervals (yhat_lower == yhat_upper == yhat)
+INTERVAL_MODES = ("full", "reduced", "analytic", "off")
+FULL_SAMPLES = 1000
+REDUCED_SAMPLES = 100
+
+
+def interval_samples(mode, reduced_samples=REDUCED_SAMPLES):
+    """Number of simulated paths for a mode (Prophet's uncertainty_samples); 0 means no simulation"""
+    if mode not in INTERVAL_MODES:
+        raise ValueError(f"Unknown interval mode {mode!r}, expected one of {INTERVAL_MODES}")
+    return {"full": FULL_SAMPLES, "reduced": reduced_samples}.get(mode, 0)
+
+
+def trend_shift_sd(likelihood, mean_delta, single_diff, horizon):
+    """Standard deviation of Prophet's simulated future trend shift, in scaled units
+
+    Prophet draws a slope change Laplace(0, mean_delta) with probability
+    ``likelihood`` per step, averages adjacent changes and integrates twice,
+    so the shift at step h is a weighted sum of independent draws. Its
+    variance is var(draw) * sum of squared weights.
+
+    Args:
+        likelihood, mean_delta, single_diff: arrays with one value per model
+
+    Returns:
+        array of shape (models, horizon)
+    """
+    steps = np.arange(1, horizon + 1)
+    # Weight of draw j in the level at step h: ((h - j + 1) + (h - j)) / 2 for j <= h
+    lag = steps[:, None] - steps[None, :]
+    weights = np.where(lag >= 0, lag + 0.5, 0.0)
+    sum_squares = (weights ** 2).sum(axis=1)
+    draw_variance = np.asarray(likelihood) * 2 * np.asarray(mean_delta) ** 2
+    return np.asarray(single_diff)[:, None] * np.sqrt(draw_variance[:, None] * sum_squares[None, :])
+
+
+def analytic_bounds(yhat, sigma, trend_scale, trend_sd, interval_width):
+    """Normal approximation of Prophet's interval: observation noise plus trend shift
+
+    Args:
+        yhat: point forecasts
+        sigma: observation noise standard deviation in y units (sigma_obs * y_scale)
+        trend_scale: y units per scaled trend unit (y_scale * (1 + multiplicative terms))
+        trend_sd: trend_shift_sd
+        interval_width: e.g. 0.95
+
+    All arguments broadcast against yhat.
+    """
+    z = np.vectorize(NormalDist().inv_cdf)((1 + np.asarray(interval_width)) / 2)
+    sd = np.sqrt(np.asarray(sigma) ** 2 + (trend_scale * trend_sd) ** 2)
+    return yhat - z * sd, yhat + z * sd
+
+
+def prophet_analytic_bounds(model, forecast):
+    """Analytic interval for a Prophet.predict result that only covers future dates
+
+    Same approximation as ProphetBatchPredictor's "analytic" mode, for models
+    predicted one by one.
+    """
+    horizon = len(forecast)
+    single_diff = np.array([pd.Timedelta(days=1) / model.t_scale])
+    if model.growth == "flat":
+        likelihood = np.zeros(1)
+    else:
+        likelihood = len(model.changepoints_t) * single_diff
+    mean_delta = np.array([np.mean(np.abs(model.params["delta"][0])) + 1e-8])
+    return analytic_bounds(
+        forecast["yhat"].to_numpy(),
+        sigma=model.params["sigma_obs"][0, 0] * model.y_scale,
+        trend_scale=model.y_scale * (1 + forecast["multiplicative_terms"].to_numpy()),
+        trend_sd=trend_shift_sd(likelihood, mean_delta, single_diff, horizon)[0],
+        interval_width=model.interval_width,
+    )
@@ -0,0 +1,130 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from .prophet_batch import ProphetBatchPredictor
+from .utils import LOG
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_ARRAY = "models.npy"
+BUNDLE_INDEX = "index.json"
+FORMAT_VERSION = 1
+
+
+def is_bundle(path):
+    return os.path.isfile(os.path.join(path, BUNDLE_INDEX)) and os.path.isfile(os.path.join(path, BUNDLE_ARRAY))
+
+
+def write_bundle(predictor, path):
+    """Save the per-series models of a ProphetBatchPredictor as a bundle directory
+
+    The bundle holds two files:
+        models.npy  one fixed-size record per series with all fitted parameters
+                    (structured array, so one series is one contiguous slice)
+        index.json  seasonality layout and (store, item) -> record index
+    Records are sorted by (store, item), so every store owns one contiguous
+    range of rows. The directory is logged to MLflow as a single artifact.
+
+    Returns:
+        size of the bundle in bytes
+    """
+    series = predictor.series.sort_values(["store", "item"]).reset_index(drop=True)
+    if series["row"].duplicated().any():
+        raise ValueError("A bundle needs one model per series")
+
+    rows = series["row"].to_numpy()
+    dtype = np.dtype([(name, values.dtype, values.shape[1:]) for name, values in predictor.arrays.items()])
+    records = np.empty(len(rows), dtype=dtype)
+    for name, values in predictor.arrays.items():
+        records[name] = values[rows]
+
+    stores = series["store"].to_numpy(dtype=np.int64)
+    unique_stores, first_rows, counts = np.unique(stores, return_index=True, return_counts=True)
+    index = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "layout": [list(seasonality) for seasonality in predictor.layout],
+        "series": len(records),
+        "items": series["item"].astype(np.int64).tolist(),
+        "stores": {
+            str(store): [int(first), int(first + count)]
+            for store, first, count in zip(unique_stores, first_rows, counts)
+        },
+    }
+
+    # Temporary names, then rename into place, like the serving store
+    os.makedirs(path, exist_ok=True)
+    array_path, index_path = os.path.join(path, BUNDLE_ARRAY), os.path.join(path, BUNDLE_INDEX)
+    with open(array_path + ".tmp", "wb") as f:
+        np.save(f, records)
+    os.replace(array_path + ".tmp", array_path)
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    size = os.path.getsize(array_path) + os.path.getsize(index_path)
+    LOG.info(f"🗜️  Wrote model bundle with {len(records):,} series ({size / 1e6:.1f} MB) to {path}")
+    return size
+
+
+class ModelBundle:
+    """Read-only, memory-mapped view of a model bundle (see write_bundle).
+
+    Opening only reads the small JSON index; parameters are paged in from the
+    memory-mapped records when a series is predicted, so serving can pick any
+    series' model without deserializing the whole fleet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, BUNDLE_INDEX)) as f:
+            index = json.load(f)
+        if index["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model bundle format {index['format_version']}")
+        self.records = np.load(os.path.join(path, BUNDLE_ARRAY), mmap_mode="r")
+        self.layout = tuple((name, float(period), int(order)) for name, period, order in index["layout"])
+        self.items = np.asarray(index["items"], dtype=np.int64)
+        self.store_rows = {int(store): tuple(rows) for store, rows in index["stores"].items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    def row(self, store, item):
+        """Record of one series, or None if the bundle has no model for it"""
+        rows = self.store_rows.get(int(store))
+        if rows is None:
+            return None
+        start, end = rows
+        position = start + np.searchsorted(self.items[start:end], int(item))
+        return int(position) if position < end and self.items[position] == int(item) else None
+
+    def keys(self):
+        """DataFrame with the store and item of every record"""
+        stores = np.empty(len(self.items), dtype=np.int64)
+        for store, (start, end) in self.store_rows.items():
+            stores[start:end] = store
+        return pd.DataFrame({"store": stores, "item": self.items})
+
+    def predictor(self, keys=None):
+        """ProphetBatchPredictor for the given (store, item) pairs, or all series
+
+        Series without a model in the bundle are left out.
+        """
+        if keys is None:
+            rows, series = np.arange(len(self.records)), self.keys()
+        else:
+            keys = [(int(store), int(item)) for store, item in keys]
+            found = [(key, self.row(*key)) for key in keys]
+            found = [(key, row) for key, row in found if row is not None]
+            if len(found) < len(keys):
+                logger.info(f"Model bundle has no model for {len(keys) - len(found)} of {len(keys)} series")
+            rows = np.array([row for _, row in found], dtype=np.int64)
+            series = pd.DataFrame({"store": [key[0] for key, _ in found], "item": [key[1] for key, _ in found]})
+        # Fancy indexing reads only the requested records from the memory map
+        selected = self.records[np.sort(rows)] if len(rows) else self.records[:0]
+        order = np.argsort(np.argsort(rows))
+        arrays = {name: np.ascontiguousarray(selected[name]) for name in self.records.dtype.names}
+        return ProphetBatchPredictor(arrays, self.layout, series.assign(row=order.astype(np.int32)))
@@ -1,6 +1,6 @@
 from sqlalchemy.ext.automap import automap_base
 from sqlalchemy import MetaData, Table
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Date
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, ForeignKey, Date, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -38,3 +38,19 @@ class PredictionResults(Base):
     yhat_lower = Column(Float)
     yhat_upper = Column(Float)
     model_version = Column(String)
+
+
+# Readers look rows up by (store, run); also created for tables that existed before it
+FORECASTS_RUN_INDEX = Index("ix_forecasts_store_created_at", PredictionResults.store, PredictionResults.created_at)
+
+
+class ForecastRun(Base):
+    """One prediction run of one store in the forecasts table (see forecast_table.ForecastTable)"""
+    __tablename__ = "forecast_runs"
+    store = Column(Integer, primary_key=True)
+    # Every row of the run in forecasts carries this created_at
+    created_at = Column(DateTime, primary_key=True)
+    row_count = Column(Integer)
+    model_version = Column(String(100))
+    # "staged" while rows are written, then "current" (served) and "retired"
+    status = Column(String(16), nullable=False, index=True)
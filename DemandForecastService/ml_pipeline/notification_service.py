@@ -1,37 +1,308 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, APIRouter
-from typing import List
+from typing import Callable, Dict, Optional, Set
 import json
+import zlib
+import numpy as np
+import pandas as pd
 import logging
 from datetime import datetime
 import asyncio
+from .config import Config
+from .instrumentation import REGISTRY
 
 logger = logging.getLogger(__name__)
 
+CONNECTIONS = REGISTRY.gauge("notification_connections", "Connected dashboard WebSockets")
+MESSAGES_SKIPPED = REGISTRY.counter(
+    "notification_messages_skipped_total", "Messages not delivered to slow consumers", ["reason"]
+)
+
+COALESCE = "coalesce"
+DROP = "drop"
+
+# Delta payloads are sent as zlib-compressed binary frames unless a client asks for text
+ZLIB = "zlib"
+NO_COMPRESSION = "none"
+
+# Queued in place of everything a slow consumer fell behind on (see ConnectionManager._offer)
+RESYNC = object()
+
+
+class Subscriber:
+    """One dashboard connection with its own bounded send queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.writer: asyncio.Task = None
+        self.coalesced = 0
+        self.topics: Set[str] = set()
+        self.compression = ZLIB
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-    
+    """Fans messages out to every connected dashboard without blocking on any of them.
+
+    broadcast only enqueues: each connection has a writer task draining its own
+    bounded queue, so a slow client delays nobody else. When a client's queue
+    is full the slow consumer policy applies: "coalesce" replaces everything
+    queued with a resync, full snapshots of the client's topics from
+    ``snapshot`` taken when it is sent; "drop" disconnects the client.
+    """
+
+    def __init__(self, max_queue=Config.NOTIFICATION_QUEUE_SIZE,
+                 slow_consumer_policy=Config.NOTIFICATION_SLOW_CONSUMER_POLICY,
+                 send_timeout=Config.NOTIFICATION_SEND_TIMEOUT,
+                 snapshot: Optional[Callable[[str], Optional[dict]]] = None):
+        if slow_consumer_policy not in (COALESCE, DROP):
+            raise ValueError(f"Unknown slow consumer policy '{slow_consumer_policy}'")
+        self.max_queue = max_queue
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_timeout = send_timeout
+        # topic -> full payload of its current state, or None when there is none
+        self.snapshot = snapshot
+        self.active_connections: Dict[WebSocket, Subscriber] = {}
+        self.topics: Dict[str, Set[Subscriber]] = {}
+        # Close tasks of dropped consumers, referenced until done so they are not garbage collected
+        self._close_tasks: Set[asyncio.Task] = set()
+
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        subscriber = Subscriber(websocket, self.max_queue)
+        subscriber.writer = asyncio.create_task(self._write(subscriber))
+        self.active_connections[websocket] = subscriber
+        CONNECTIONS.set(len(self.active_connections))
         logger.info(f"New WebSocket connection. Total: {len(self.active_connections)}")
-    
+        return subscriber
+
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        subscriber = self.active_connections.pop(websocket, None)
+        if subscriber is None:
+            return
+        self.unsubscribe(subscriber, list(subscriber.topics))
+        if subscriber.writer is not None and subscriber.writer is not asyncio.current_task():
+            subscriber.writer.cancel()
+        CONNECTIONS.set(len(self.active_connections))
         logger.info(f"WebSocket disconnected. Total: {len(self.active_connections)}")
-    
+
+    async def _write(self, subscriber: Subscriber):
+        """Writer task: send queued messages in order until the connection fails"""
+        try:
+            while True:
+                message = await subscriber.queue.get()
+                if message is RESYNC:
+                    for message in self._resync_messages(subscriber):
+                        await self._send(subscriber, message)
+                else:
+                    await self._send(subscriber, message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Dropping WebSocket after failed send: {e}")
+            self.disconnect(subscriber.websocket)
+
+    async def _send(self, subscriber: Subscriber, message):
+        if isinstance(message, bytes):
+            await asyncio.wait_for(subscriber.websocket.send_bytes(message), self.send_timeout)
+        else:
+            await asyncio.wait_for(subscriber.websocket.send_text(message), self.send_timeout)
+
+    def _resync_messages(self, subscriber: Subscriber):
+        if self.snapshot is None:
+            return []
+        snapshots = (self.snapshot(topic) for topic in sorted(subscriber.topics))
+        return [encode_payload(payload, subscriber.compression) for payload in snapshots if payload is not None]
+
+    def _offer(self, subscriber: Subscriber, message: str):
+        try:
+            subscriber.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == DROP:
+            MESSAGES_SKIPPED.inc(reason="disconnected")
+            logger.info("Disconnecting slow WebSocket consumer")
+            self.disconnect(subscriber.websocket)
+            task = asyncio.create_task(self._close(subscriber.websocket))
+            self._close_tasks.add(task)
+            task.add_done_callback(self._close_tasks.discard)
+            return
+
+        # Coalesce: deltas only apply on top of every earlier one, so rather than lose one
+        # the client is sent its restaurants' current state once the writer catches up
+        skipped = 1
+        while not subscriber.queue.empty():
+            if subscriber.queue.get_nowait() is not RESYNC:
+                skipped += 1
+        subscriber.queue.put_nowait(RESYNC)
+        subscriber.coalesced += skipped
+        MESSAGES_SKIPPED.inc(skipped, reason="coalesced")
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+
+    def send_to(self, subscriber: Subscriber, message):
+        """Queue one already serialized message for one connection; never waits on sends"""
+        self._offer(subscriber, message)
+
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
-    
+        subscriber = self.active_connections.get(websocket)
+        if subscriber is not None:
+            self.send_to(subscriber, message)
+
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                # Remove broken connections
-                self.active_connections.remove(connection)
+        """Queue one already serialized message for every connection; never waits on sends"""
+        for subscriber in list(self.active_connections.values()):
+            self.send_to(subscriber, message)
+
+    def subscribe(self, subscriber: Subscriber, topics):
+        for topic in topics:
+            subscriber.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber, topics):
+        for topic in topics:
+            subscriber.topics.discard(topic)
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def subscribers(self, topic):
+        return list(self.topics.get(topic, ()))
+
+    def publish(self, topic, payload: dict):
+        """Queue a payload for the subscribers of one topic.
+        It is serialized (and compressed) once per encoding, not once per client."""
+        subscribers = self.subscribers(topic)
+        if not subscribers:
+            return 0
+        encoded = {}
+        for subscriber in subscribers:
+            if subscriber.compression not in encoded:
+                encoded[subscriber.compression] = encode_payload(payload, subscriber.compression)
+            self.send_to(subscriber, encoded[subscriber.compression])
+        return len(subscribers)
+
 
-manager = ConnectionManager()
+def restaurant_topic(restaurant_id):
+    return f"restaurant:{restaurant_id}"
+
+
+def store_key(restaurant_id):
+    """Store id that forecasts are published under, or None if ``restaurant_id`` is not one"""
+    if isinstance(restaurant_id, bool):
+        return None
+    if isinstance(restaurant_id, int):
+        return restaurant_id
+    if isinstance(restaurant_id, str) and restaurant_id.strip().isdigit():
+        return int(restaurant_id)
+    return None
+
+
+def encode_payload(payload: dict, compression=ZLIB):
+    text = json.dumps(payload, separators=(",", ":"), default=str)
+    if compression == ZLIB:
+        return zlib.compress(text.encode(), 6)
+    return text
+
+
+class ForecastDeltaTracker:
+    """Keeps the last published forecast per restaurant and diffs new runs against it.
+
+    Only rows whose yhat/yhat_lower/yhat_upper moved by more than ``tolerance``,
+    new (item, date) keys and removed keys are reported.
+    """
+
+    KEYS = ["store", "item", "forecast_date"]
+    VALUES = ["yhat", "yhat_lower", "yhat_upper"]
+
+    def __init__(self, tolerance=1e-3):
+        self.tolerance = tolerance
+        self.current = None
+        self.run_id = None
+
+    def _normalize(self, predictions):
+        df = predictions[self.KEYS + self.VALUES].copy()
+        df["forecast_date"] = pd.to_datetime(df["forecast_date"]).dt.strftime("%Y-%m-%d")
+        return df
+
+    def update(self, predictions, run_id=None):
+        """Diff a run against the previous one and make it the new baseline
+
+        Returns:
+            dict of store -> delta payload, for stores where something changed
+        """
+        new = self._normalize(predictions)
+        old = self.current if self.current is not None else new.iloc[0:0]
+        merged = new.merge(old, on=self.KEYS, how="outer", suffixes=("", "_previous"), indicator=True)
+
+        added = merged["_merge"] == "left_only"
+        removed = merged["_merge"] == "right_only"
+        moved = np.zeros(len(merged), dtype=bool)
+        for value in self.VALUES:
+            moved |= (merged[value] - merged[f"{value}_previous"]).abs().to_numpy() > self.tolerance
+        changed = merged[added | (moved & (merged["_merge"] == "both"))]
+        gone = merged[removed]
+
+        self.current = new
+        self.run_id = run_id
+
+        deltas = {}
+        for store in set(changed["store"].unique()) | set(gone["store"].unique()):
+            deltas[int(store)] = self._payload(
+                store,
+                changed[changed["store"] == store],
+                gone[gone["store"] == store],
+                full=False,
+            )
+        return deltas
+
+    def snapshot(self, store):
+        """Full current forecast of a restaurant (store id), sent when a client subscribes"""
+        if self.current is None:
+            return None
+        rows = self.current[self.current["store"] == int(store)]
+        if rows.empty:
+            return None
+        return self._payload(store, rows, rows.iloc[0:0], full=True)
+
+    def _payload(self, store, changed, removed, full):
+        return {
+            "type": "forecast_delta",
+            "restaurant_id": str(store),
+            "run_id": self.run_id,
+            "timestamp": datetime.now().isoformat(),
+            "full": full,
+            # Columnar rows: parallel arrays are far smaller than one object per row
+            "changed": {
+                "item_id": changed["item"].astype(int).tolist(),
+                "forecast_date": changed["forecast_date"].tolist(),
+                "yhat": changed["yhat"].round(3).tolist(),
+                "yhat_lower": changed["yhat_lower"].round(3).tolist(),
+                "yhat_upper": changed["yhat_upper"].round(3).tolist(),
+            },
+            "removed": {
+                "item_id": removed["item"].astype(int).tolist(),
+                "forecast_date": removed["forecast_date"].tolist(),
+            },
+        }
+
+
+delta_tracker = ForecastDeltaTracker()
+
+
+def topic_snapshot(topic):
+    """Full current forecast behind a restaurant_topic, or None"""
+    return delta_tracker.snapshot(topic.removeprefix(restaurant_topic("")))
+
+
+manager = ConnectionManager(snapshot=topic_snapshot)
 
 # WebSocket endpoints
 router = APIRouter(
@@ -41,21 +312,77 @@ router = APIRouter(
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    """Dashboard socket.
+
+    Clients subscribe to restaurants by sending
+        {"action": "subscribe", "restaurant_ids": ["3", "7"], "compression": "zlib"}
+    ("unsubscribe" removes topics). Restaurant ids are the store ids forecasts
+    are published under; other ids are answered with an "error" message. They then get the current forecast of each
+    restaurant once, followed by forecast_delta messages with only the rows that
+    changed in each prediction run. Deltas are zlib-compressed binary frames
+    unless "compression": "none" is requested.
+    """
+    subscriber = await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.send_personal_message(f"Message received: {data}", websocket)
+            try:
+                request = json.loads(data)
+            except ValueError:
+                request = None
+            if not isinstance(request, dict) or request.get("action") not in ("subscribe", "unsubscribe"):
+                await manager.send_personal_message(f"Message received: {data}", websocket)
+                continue
+
+            restaurant_ids = request.get("restaurant_ids", [])
+            if not isinstance(restaurant_ids, list):
+                restaurant_ids = [restaurant_ids]
+            stores = [store_key(restaurant_id) for restaurant_id in restaurant_ids]
+            invalid = [restaurant_id for restaurant_id, store in zip(restaurant_ids, stores) if store is None]
+            if invalid:
+                await manager.send_personal_message(json.dumps({
+                    "type": "error",
+                    "message": "Unknown restaurant ids, expected store ids",
+                    "restaurant_ids": invalid,
+                }, default=str), websocket)
+            stores = [store for store in stores if store is not None]
+            # Same keys notify_new_predictions publishes under
+            topics = [restaurant_topic(store) for store in stores]
+            if request["action"] == "unsubscribe":
+                manager.unsubscribe(subscriber, topics)
+                continue
+
+            if request.get("compression") in (ZLIB, NO_COMPRESSION):
+                subscriber.compression = request["compression"]
+            manager.subscribe(subscriber, topics)
+            for store in stores:
+                snapshot = delta_tracker.snapshot(store)
+                if snapshot is not None:
+                    manager.send_to(subscriber, encode_payload(snapshot, subscriber.compression))
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
-async def notify_new_predictions(predictions):
-    """Notify dashboard of new predictions"""
+async def notify_new_predictions(predictions, run_id=None):
+    """Notify dashboards of a prediction run.
+
+    Subscribers of a restaurant receive only that restaurant's changed rows;
+    every client gets a short summary without row data.
+    """
+    deltas = delta_tracker.update(predictions, run_id)
+    delivered = 0
+    for store, payload in deltas.items():
+        delivered += manager.publish(restaurant_topic(store), payload)
+
     message = {
         "type": "new_predictions",
         "timestamp": datetime.now().isoformat(),
+        "run_id": run_id,
         "count": len(predictions),
-        "predictions": predictions[:5]  # Send first 5 as preview
+        "restaurants_changed": sorted(deltas),
     }
+    # Serialized once, the same string is queued for every connection
     await manager.broadcast(json.dumps(message))
-    logger.info(f"Broadcasted notification for {len(predictions)} predictions")
\ No newline at end of file
+    logger.info(f"Notified {delivered} subscriptions about changes in {len(deltas)} restaurants "
+                f"({len(predictions)} predictions)")
@@ -2,11 +2,16 @@ import schedule
 import time
 import logging
 from datetime import datetime, timedelta
+import pandas as pd
 from .extractor import DataExtractor
 from .preprocessor import FeatureEngineer
 from .feast_store import FeastFeatureStore
-from .trainer import ProphetTrainer
+from .trainer import ProphetTrainer, GlobalXGBTrainer
 from .predictor import DemandPredictor
+from .sharded_prediction import ShardedPrediction
+from .serving_store import ForecastServingStore
+from .instrumentation import span
+from .profiling import PipelineProfiler
 from .notification_service import notify_new_predictions
 from .config import Config
 import asyncio
@@ -22,40 +27,121 @@ class MLPipelineOrchestrator:
         logger.info("Instantiated Feature preprocessor...")
         self.feature_store = FeastFeatureStore(Config.FEAST_REPO_PATH)
         logger.info("Instantiated Feature Store....")
-        self.trainer = ProphetTrainer(Config.MLFLOW_TRACKING_URI, Config.WANDB_PROJECT, Config.WANDB_API_KEY)
+        if Config.FORECAST_BACKEND == "xgboost":
+            self.trainer = GlobalXGBTrainer(Config.MLFLOW_TRACKING_URI, Config.WANDB_PROJECT, Config.WANDB_API_KEY)
+        else:
+            self.trainer = ProphetTrainer(
+                Config.MLFLOW_TRACKING_URI, Config.WANDB_PROJECT, Config.WANDB_API_KEY,
+                interval_mode=Config.INTERVAL_MODE, reduced_samples=Config.INTERVAL_SAMPLES,
+            )
         logger.info("Instantiated Trainer...")
         self.predictor = DemandPredictor(
             Config.MLFLOW_TRACKING_URI, 
             Config.MODEL_NAME,
             Config.PREDICTIONS_DB_URL,
+            feature_store=self.feature_store,
+            backend=Config.FORECAST_BACKEND,
+            batch_predict=Config.PROPHET_BATCH_PREDICT,
+            interval_mode=Config.INTERVAL_MODE,
+            reduced_samples=Config.INTERVAL_SAMPLES,
+            predict_budget=Config.SERIES_PREDICT_BUDGET_SECONDS,
+            partition_forecasts=Config.FORECAST_PARTITIONED,
+            online_features=Config.XGB_ONLINE_FEATURES,
         )
         logger.info("Instantiated predictor.....")
+        self.sharded_prediction = ShardedPrediction(
+            self.predictor,
+            Config.PREDICTION_QUEUE_PATH,
+            shard_size=Config.PREDICTION_SHARD_SIZE,
+            lease_seconds=Config.PREDICTION_LEASE_SECONDS,
+            max_attempts=Config.PREDICTION_MAX_ATTEMPTS,
+        ) if Config.SHARDED_PREDICTION else None
+        self.serving_store = ForecastServingStore(Config.FORECAST_STORE_PATH)
+        logger.info("Instantiated serving store.....")
+        self.profiler = PipelineProfiler(
+            Config.PROFILE_DIR,
+            enabled=Config.PROFILE_PIPELINES,
+            interval=Config.PROFILE_SAMPLE_INTERVAL,
+        )
     
     def run_training_pipeline(self):
         """Run complete training pipeline"""
         logger.info("Starting training pipeline")
         
         try:
-            # 1. Extract data
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=90)
-            
-            df = self.extractor.extract_orders(start_date, end_date)
-            
-            # 2. Feature engineering
-            self.feature_engineer.create_features(df)
+            with self.profiler.session("training") as profile, span("training", "total"):
+                # 1. Extract data
+                end_date = datetime.now()
+                start_date = end_date - timedelta(days=90)
 
-            self.feature_engineer.print_data_quality_report()
-            
-            # 3. Store features
-            # self.feature_store._setup_feature_store()
-            # self.feature_store.store_features(features)
-            
-            # 4. Prepare training data
-            train_features = self.feature_engineer.prepare_training_data()
-            
-            # 5. Train model
-            model_info = self.trainer.train(train_features)
+                with span("training", "extract") as s:
+                    df = self.extractor.extract_orders(start_date, end_date)
+                    s.rows = len(df)
+
+                # 2. Feature engineering
+                with span("training", "create_features") as s:
+                    self.feature_engineer.create_features(df)
+                    s.rows = len(df)
+
+                with span("training", "data_quality_report"):
+                    self.feature_engineer.print_data_quality_report()
+
+                # 3. Store features
+                with span("training", "compute_demand_features") as s:
+                    features = self.feature_engineer.compute_demand_features(include_next_day=True)
+                    s.rows = len(features)
+
+                # The models train from the sales tables, so a Feast failure only costs online features
+                try:
+                    with span("training", "store_features") as s:
+                        self.feature_store._setup_feature_store()
+                        self.feature_store.store_features(features)
+                        s.rows = len(features)
+
+                    # Latest lags to the online store for prediction from online features;
+                    # the next-day rows are dated after today's sales, so materialize past them
+                    with span("training", "materialize_features"):
+                        self.feature_store.materialize(
+                            end_date=pd.Timestamp(features["order_date"].max()).to_pydatetime() + timedelta(days=1)
+                        )
+                except Exception as e:
+                    logger.error(f"Storing features in Feast failed, training continues without them: {e}")
+
+                # 4. Prepare training data
+                with span("training", "prepare_training_data") as s:
+                    if Config.FORECAST_BACKEND == "xgboost" or Config.PROPHET_PER_SERIES:
+                        # The global model and the per-series models train on every series
+                        train_features = self.feature_engineer.load_sales_history()
+                    else:
+                        train_features = self.feature_engineer.prepare_training_data()
+                    s.rows = 0 if train_features is None else len(train_features)
+
+                if Config.TUNE_HYPERPARAMETERS and Config.FORECAST_BACKEND == "prophet":
+                    with span("training", "tune"):
+                        self.trainer.tune(
+                            self.feature_engineer.load_sales_history(),
+                            max_trials=Config.TUNING_MAX_TRIALS,
+                            max_workers=Config.TUNING_MAX_WORKERS,
+                            max_series=Config.TUNING_SERIES,
+                        )
+
+                # 5. Train model
+                with span("training", "train") as s:
+                    if Config.FORECAST_BACKEND == "prophet" and Config.PROPHET_PER_SERIES:
+                        model_info = self.trainer.train_series(
+                            train_features, fit_budget=Config.SERIES_FIT_BUDGET_SECONDS,
+                        )
+                    elif Config.BACKTEST_ON_TRAIN and Config.FORECAST_BACKEND == "prophet":
+                        model_info = self.trainer.train(
+                            train_features,
+                            backtest_df=self.feature_engineer.load_sales_history(),
+                            backtest_folds=Config.BACKTEST_FOLDS,
+                        )
+                    else:
+                        model_info = self.trainer.train(train_features)
+                    s.rows = len(train_features)
+            if profile is not None:
+                profile.log(self.trainer.tracker, model_info.run)
             return model_info
             
         except Exception as e:
@@ -67,25 +153,52 @@ class MLPipelineOrchestrator:
         logger.info("Starting prediction pipeline")
         
         try:
-            # Get all restaurants and items (simplified)
-            print(latest_model_info)
-            model = self.predictor._load_model(latest_model_info)
-            logger.info(f"model loaded....")
-            predictions = self.predictor.predict_daily_demand()
+            with self.profiler.session("prediction"), span("prediction", "total"):
+                # Get all restaurants and items (simplified)
+                print(latest_model_info)
+                with span("prediction", "load_model"):
+                    model = self.predictor._load_model(latest_model_info)
+                logger.info(f"model loaded....")
+                with span("prediction", "predict_daily_demand") as s:
+                    if self.sharded_prediction is not None:
+                        _, predictions = self.sharded_prediction.run(latest_model_info.model_uri)
+                    else:
+                        predictions = self.predictor.predict_daily_demand()
+                    s.rows = 0 if predictions is None else len(predictions)
+                logger.info(f"Prediction report: {self.predictor.report}")
 
-            self.predictor.store_predictions(predictions)
-            
-            # Store predictions
-            
-            
-            # Notify dashboard
-            # await notify_new_predictions(all_predictions)
+                with span("prediction", "store_predictions") as s:
+                    self.predictor.store_predictions(predictions)
+                    s.rows = len(predictions)
+
+                # Publish arrays for database-free reads in the API
+                with span("prediction", "publish_serving_store") as s:
+                    run_id = self.serving_store.publish(predictions)
+                    s.rows = len(predictions)
+
+                # Notify dashboards subscribed to the restaurants that changed
+                with span("prediction", "notify") as s:
+                    await notify_new_predictions(predictions, run_id)
+                    s.rows = len(predictions)
             
             logger.info(f"Prediction pipeline completed. Generated {len(predictions)} predictions")
             
         except Exception as e:
             logger.error(f"Prediction pipeline failed: {e}")
     
+    def run_forecast_retention(self):
+        """Delete forecast runs beyond the retention limits from the forecasts table"""
+        try:
+            with span("retention", "compact") as s:
+                summary = self.predictor.forecast_table.compact(
+                    keep_runs=Config.FORECAST_RETENTION_RUNS,
+                    keep_days=Config.FORECAST_RETENTION_DAYS,
+                )
+                s.rows = summary["deleted_rows"]
+            return summary
+        except Exception as e:
+            logger.error(f"Forecast retention failed: {e}")
+
     def schedule_jobs(self):
         """Schedule pipeline jobs"""
         # Train model weekly
@@ -93,6 +206,9 @@ class MLPipelineOrchestrator:
         
         # Generate predictions daily
         schedule.every().hour.at("01:00").do(self.run_prediction_pipeline)
+
+        # Trim the forecasts table daily
+        schedule.every().day.at("03:30").do(self.run_forecast_retention)
         
         logger.info("Pipeline jobs scheduled")
     
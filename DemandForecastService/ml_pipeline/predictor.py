@@ -7,13 +7,25 @@ import pandas as pd
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from .models import PredictionResults, Base
+from .forecast_table import ForecastTable
+from .instrumentation import series_timer, SERIES_FAILURES, SERIES_FALLBACKS
+from .global_forecaster import GlobalXGBForecaster
+from .prophet_batch import ProphetBatchPredictor
+from .model_bundle import ModelBundle, is_bundle
+from .intervals import REDUCED_SAMPLES, interval_samples, prophet_analytic_bounds
+from .budgets import BudgetExceeded, FALLBACK_MODEL_VERSION, seasonal_naive, time_budget
 import logging
 
 logger = logging.getLogger(__name__)
 
+MIN_HISTORY_DAYS = 90
+FORECAST_HORIZON_DAYS = 15
+PROPHET_MODEL_VERSION = "prophet_v1.1.5_serverless_optimized"
+
 class DemandPredictor:
-    def __init__(self, mlflow_uri, model_name, db_url):
+    def __init__(self, mlflow_uri, model_name, db_url, feature_store=None, backend="prophet", batch_predict=True,
+                 interval_mode="full", reduced_samples=REDUCED_SAMPLES, predict_budget=None,
+                 partition_forecasts=False, online_features=False):
         self.mlflow_uri = mlflow_uri
         self.model_name = model_name
         self.db_url = db_url
@@ -22,14 +34,35 @@ class DemandPredictor:
         self.engine = create_engine(db_url)
         self.Session = sessionmaker(bind=self.engine)
         self.model = None
+        self.backend = backend
+        # Prophet models: vectorized NumPy prediction instead of one Prophet.predict per series
+        self.batch_predict = batch_predict
+        # Interval computation for Prophet models, see intervals.INTERVAL_MODES
+        self.interval_mode = interval_mode
+        self.reduced_samples = reduced_samples
+        # Seconds one series may spend in Prophet.predict before it falls back to a seasonal naive forecast
+        self.predict_budget = predict_budget
+        # Summary of the last predict_daily_demand run (interval mode and cost, fallback series, ...)
+        self.report = {}
+        self.feature_store = feature_store
+        # Global model: score from the feature store's latest lags instead of the sales history
+        self.online_features = online_features
 
-        Base.metadata.create_all(bind=self.engine)
+        # Runs are staged, then swapped in per store; see ForecastTable
+        self.forecast_table = ForecastTable(self.engine, partitioned=partition_forecasts)
+        self.forecast_table.create()
         mlflow.set_tracking_uri(mlflow_uri)
     def _load_model(self, model_info):
         """Load model from MLflow"""
 
         try:
-            self.model = mlflow.prophet.load_model(model_info.model_uri)
+            if self.backend == "xgboost":
+                self.model = GlobalXGBForecaster.load(model_info.model_uri, feature_store=self.feature_store)
+            elif is_bundle(model_info.model_uri):
+                # Per-series models: memory-mapped, parameters are read when predicted
+                self.model = ModelBundle(model_info.model_uri)
+            else:
+                self.model = mlflow.prophet.load_model(model_info.model_uri)
             logger.info("Model loaded successfully from MLflow")
             return self.model
         except Exception as e:
@@ -40,8 +73,41 @@ class DemandPredictor:
         """Generate daily demand predictions"""
         
         # self.model =self._load_model(model_info)
+        return self.predict_frame(self.load_sales())
+
+    def load_sales(self):
+        """Spark DataFrame of the raw sales table (date, store, item, sales)"""
         raw_table = f"{self.db_name}.raw_sales_data"
-        df = self.spark.table(raw_table)
+        return self.spark.table(raw_table)
+
+    def predict_frame(self, df):
+        """Predictions for every store-item series in a Spark sales DataFrame"""
+        if isinstance(self.model, GlobalXGBForecaster):
+            # Intervals come from the model's validation residuals, nothing to simulate
+            self.report = {"interval_mode": "residual_quantiles", "interval_samples": 0}
+            if self.online_features:
+                return self._predict_online(df)
+            return self._predict_global(df)
+        self.report = {"interval_mode": self.interval_mode,
+                       "interval_samples": interval_samples(self.interval_mode, self.reduced_samples),
+                       "fallback_series": []}
+        if isinstance(self.model, ModelBundle):
+            return self._predict_batch(df)
+        if self.batch_predict:
+            try:
+                return self._predict_batch(df)
+            except ValueError as e:
+                print(f"⚠️  Batch prediction unavailable ({e}), predicting series one by one")
+        # Prophet simulates as many paths as uncertainty_samples says; 0 skips simulation
+        trained_samples = self.model.uncertainty_samples
+        self.model.uncertainty_samples = self.report["interval_samples"]
+        try:
+            return self._predict_series(df)
+        finally:
+            self.model.uncertainty_samples = trained_samples
+
+    def _predict_series(self, df):
+        """One Prophet.predict per store-item series"""
         available_combinations = (
             df.select("store", "item")
             .distinct()
@@ -52,9 +118,6 @@ class DemandPredictor:
 
         # Create forecast results storage
         all_forecasts = []
-        MIN_HISTORY_DAYS = 90
-        FORECAST_HORIZON_DAYS = 15 
-        MODEL_VERSION = "prophet_v1.1.5_serverless_optimized"
 
         # Process each combination individually for better error handling
         for i, row in enumerate(available_combinations):
@@ -63,12 +126,13 @@ class DemandPredictor:
             
             try:
                 # Filter data for this specific store-item combination
-                store_item_data = (
-                    df.filter((col("store") == store_id) & (col("item") == item_id))
-                    .select("date", "sales")
-                    .orderBy("date")
-                    .toPandas()
-                )
+                with series_timer("prediction", "fetch"):
+                    store_item_data = (
+                        df.filter((col("store") == store_id) & (col("item") == item_id))
+                        .select("date", "sales")
+                        .orderBy("date")
+                        .toPandas()
+                    )
                 
                 # Check if we have enough data
                 if len(store_item_data) < MIN_HISTORY_DAYS:
@@ -81,8 +145,17 @@ class DemandPredictor:
                 prophet_df = prophet_df.sort_values('ds').drop_duplicates(subset=['ds'])
 
 
-                future = self.model.make_future_dataframe(periods=FORECAST_HORIZON_DAYS)
-                forecast = self.model.predict(future)
+                try:
+                    # Interrupted after predict_budget seconds, so one slow series cannot hold up the run
+                    with time_budget(self.predict_budget):
+                        with series_timer("prediction", "predict"):
+                            future = self.model.make_future_dataframe(periods=FORECAST_HORIZON_DAYS)
+                            forecast = self.model.predict(future)
+                        with series_timer("prediction", "intervals"):
+                            self._add_intervals(forecast)
+                except BudgetExceeded:
+                    all_forecasts.extend(self._fallback(prophet_df, store_id, item_id, "predict_timeout").to_dict("records"))
+                    continue
         
                 # Get only future predictions
                 last_date = prophet_df['ds'].max()
@@ -98,13 +171,14 @@ class DemandPredictor:
                         'yhat': max(0, float(forecast_row['yhat'])),
                         'yhat_lower': max(0, float(forecast_row['yhat_lower'])),
                         'yhat_upper': max(0, float(forecast_row['yhat_upper'])),
-                        'model_version': MODEL_VERSION
+                        'model_version': PROPHET_MODEL_VERSION
                     })
                 
                 if (i + 1) % 25 == 0:  # Progress update every 25 combinations
                     print(f"📈 Processed {i + 1}/{len(available_combinations)} combinations...")
                     
             except Exception as e:
+                SERIES_FAILURES.inc(pipeline="prediction")
                 print(f"❌ Error with Store {store_id}, Item {item_id}: {str(e)}")
                 continue
 
@@ -142,48 +216,152 @@ class DemandPredictor:
         
 
     
-    def _create_prediction_features(self, restaurant_id, item_id, prediction_date):
-        """Create feature vector for prediction"""
-        # Simplified feature creation for demo
-        # In practice, this would fetch from feature store
-        features = [
-            hash(restaurant_id) % 100,  # restaurant encoding
-            hash(item_id) % 50,         # item encoding
-            prediction_date.weekday(),  # day of week
-            prediction_date.month,      # month
-            1 if prediction_date.weekday() >= 5 else 0,  # is_weekend
-            25.0,  # mock lag features
-            30.0,
-            28.0,
-            5.0,
-            40.0,
-            15000.0,
-            100
-        ]
-        return features
+    def _predict_global(self, df, horizon=15):
+        """All series in one recursive, batched forecast with the global model"""
+        with series_timer("prediction", "predict"):
+            history = df.select("date", "store", "item", "sales").toPandas()
+            results = self.model.predict(history, horizon=horizon)
+        print(f"🔮 Generated {len(results):,} demand predictions for "
+              f"{len(results) // max(horizon, 1)} combinations with the global model")
+        return results
+
+    def _predict_online(self, df, horizon=FORECAST_HORIZON_DAYS):
+        """All series in one direct forecast from the feature store's online lag features
+
+        Only the series keys and last sale date are read from ``df``; see
+        GlobalXGBForecaster.score for the trade-off against ``_predict_global``.
+        """
+        with series_timer("prediction", "fetch"):
+            stats = df.groupBy("store", "item").agg(spark_max("date").alias("last_date")).toPandas()
+        if stats.empty:
+            print("❌ No forecasts generated")
+            return None
+        last_date = pd.Timestamp(stats["last_date"].max())
+        forecast_dates = pd.date_range(last_date + timedelta(days=1), periods=horizon, freq="D")
+        entities = list(stats[["store", "item"]].itertuples(index=False, name=None))
+
+        with series_timer("prediction", "predict"):
+            matrix, index = self.create_prediction_features(entities, forecast_dates)
+            results = self.model.score(matrix, index)
+        print(f"🔮 Generated {len(results):,} demand predictions for "
+              f"{len(entities)} combinations from online features")
+        return results
+
+    def _add_intervals(self, forecast):
+        """yhat_lower/yhat_upper for the modes Prophet.predict does not simulate"""
+        if self.interval_mode == "analytic":
+            future = forecast["ds"] > self.model.history["ds"].max()
+            forecast["yhat_lower"], forecast["yhat_upper"] = forecast["yhat"], forecast["yhat"]
+            lower, upper = prophet_analytic_bounds(self.model, forecast[future])
+            forecast.loc[future, "yhat_lower"], forecast.loc[future, "yhat_upper"] = lower, upper
+        elif self.interval_mode == "off":
+            forecast["yhat_lower"], forecast["yhat_upper"] = forecast["yhat"], forecast["yhat"]
+
+    def _fallback(self, history, store, item, reason, horizon=FORECAST_HORIZON_DAYS):
+        """Seasonal-naive predictions for one series (ds, y history), flagged in the report"""
+        self.report["fallback_series"].append({"store": int(store), "item": int(item), "reason": reason})
+        SERIES_FALLBACKS.inc(pipeline="prediction", reason=reason)
+        forecast = seasonal_naive(history, horizon, interval_width=getattr(self.model, "interval_width", 0.95),
+                                  intervals=self.interval_mode != "off")
+        return pd.DataFrame({
+            "store": int(store),
+            "item": int(item),
+            "forecast_date": forecast["ds"].dt.date,
+            "yhat": forecast["yhat"].clip(lower=0),
+            "yhat_lower": forecast["yhat_lower"].clip(lower=0),
+            "yhat_upper": forecast["yhat_upper"].clip(lower=0),
+            "model_version": FALLBACK_MODEL_VERSION,
+        })
+
+    def _predict_fallback(self, df, keys, reason):
+        """Seasonal-naive predictions for the store-item pairs in ``keys`` (store, item DataFrame)"""
+        with series_timer("prediction", "fetch"):
+            history = (
+                df.filter(col("store").isin(keys["store"].unique().tolist())
+                          & col("item").isin(keys["item"].unique().tolist()))
+                .select("date", "store", "item", "sales")
+                .toPandas()
+                .merge(keys[["store", "item"]], on=["store", "item"])
+                .rename(columns={"date": "ds", "sales": "y"})
+            )
+        return pd.concat(
+            [self._fallback(series, store, item, reason) for (store, item), series in history.groupby(["store", "item"])],
+            ignore_index=True,
+        )
+
+    def _predict_batch(self, df, horizon=FORECAST_HORIZON_DAYS):
+        """Every eligible series in one vectorized pass (see ProphetBatchPredictor)
+
+        Same output as the per-series loop: series with less than MIN_HISTORY_DAYS
+        of history are skipped and only dates after a series' last sale are kept.
+        Series a model bundle has no model for (e.g. their fit ran out of time)
+        get the seasonal-naive fallback.
+        """
+        with series_timer("prediction", "fetch"):
+            # One aggregation instead of a filtered query per series
+            stats = (
+                df.groupBy("store", "item")
+                .agg(count("*").alias("days"), spark_max("date").alias("last_date"))
+                .toPandas()
+            )
+        print(f"🎯 Discovered {len(stats)} store-item combinations in data")
+        eligible = stats[stats["days"] >= MIN_HISTORY_DAYS]
+        if len(eligible) < len(stats):
+            print(f"⚠️  {len(stats) - len(eligible)} combinations have less than {MIN_HISTORY_DAYS} days of history")
+        if eligible.empty:
+            print("❌ No forecasts generated")
+            return None
+
+        with series_timer("prediction", "predict"):
+            keys = list(zip(eligible["store"].astype(int), eligible["item"].astype(int)))
+            if isinstance(self.model, ModelBundle):
+                batch = self.model.predictor(keys)
+            else:
+                batch = ProphetBatchPredictor.from_models({key: self.model for key in keys})
+            frames = []
+            if len(batch.series):
+                predictions = batch.predict(horizon=horizon, interval_mode=self.interval_mode,
+                                            reduced_samples=self.reduced_samples)
+                frames.append(predictions.assign(model_version=PROPHET_MODEL_VERSION))
+                self.report["interval_seconds"] = batch.interval_cost["seconds"]
+        missing = eligible[["store", "item"]].merge(batch.series[["store", "item"]].drop_duplicates(),
+                                                    on=["store", "item"], how="left", indicator=True)
+        missing = missing[missing["_merge"] == "left_only"]
+        if len(missing):
+            print(f"⚠️  No model for {len(missing)} combinations, using the seasonal naive fallback")
+            frames.append(self._predict_fallback(df, missing, "no_model"))
+        results = pd.concat(frames, ignore_index=True)
+        results = results.merge(eligible[["store", "item", "last_date"]], on=["store", "item"])
+        after = pd.to_datetime(results["forecast_date"]) > pd.to_datetime(results["last_date"])
+        results = results[after].drop(columns="last_date").reset_index(drop=True)
+        for column in ("yhat", "yhat_lower", "yhat_upper"):
+            results[column] = results[column].clip(lower=0)
+        print(f"🔮 Generated {len(results):,} individual demand predictions")
+        return results
+
+    def create_prediction_features(self, entities, forecast_dates, lag_features=None):
+        """Feature matrix for every (restaurant_id, item_id) on every forecast date
+
+        Encoded with the builder saved with the global model, so codes match
+        training; lag features are fetched from the feature store unless given.
+
+        Returns:
+            (float32 matrix, index DataFrame), see PredictionFeatureBuilder.build
+        """
+        if not isinstance(self.model, GlobalXGBForecaster):
+            raise ValueError("Prediction features need a loaded global model")
+        return self.model.builder.build(entities, forecast_dates, lag_features)
     
     def store_predictions(self, predictions):
-        """Store predictions in database using SQLAlchemy ORM"""
+        """Store predictions in the forecasts table and make them the current run of their stores
 
-        session = self.Session()
+        Returns:
+            created_at of the run (see ForecastTable.publish)
+        """
         try:
-            # Prepare ORM objects with type safety
-            orm_objs = []
-            for _, pred in predictions.iterrows():
-                # Ensure correct types
-                pred["yhat"] = float(pred["yhat"])
-                pred["yhat_lower"] = float(pred["yhat_lower"])
-                pred["yhat_upper"] = float(pred["yhat_upper"])
-                # Convert forecast_date to date if it's a string
-                if isinstance(pred["forecast_date"], str):
-                    pred["forecast_date"] = datetime.strptime(pred["forecast_date"], "%Y-%m-%d").date()
-                elif isinstance(pred["forecast_date"], datetime):
-                    pred["forecast_date"] = pred["forecast_date"].date()
-                # Create ORM object
-                orm_objs.append(PredictionResults(**pred))
-            session.bulk_save_objects(orm_objs)
-            session.commit()
-            logger.info(f"Stored {len(orm_objs)} predictions")
+            created_at = self.forecast_table.publish(predictions)
+            logger.info(f"Stored {len(predictions)} predictions")
+            return created_at
         except Exception as e:
             logger.info(f"prediction storing failed.... with error {e}")
-            raise e
\ No newline at end of file
+            raise e
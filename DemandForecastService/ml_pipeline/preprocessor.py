@@ -14,8 +14,9 @@ from pyspark.sql.types import StructType, StructField, DateType, DoubleType, Int
 from datetime import datetime, timedelta
 import warnings
 from .utils import LOG
+from .demand_features import DemandFeatureEngine
 
-os.environ["JAVA_HOME"] = "/opt/homebrew/opt/openjdk@17"
+os.environ.setdefault("JAVA_HOME", "/opt/homebrew/opt/openjdk@17")
 
 warnings.filterwarnings('ignore')
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +28,7 @@ class FeatureEngineer:
         self.db_name = "forecasting"
         # self.scaler = StandardScaler()
         # self.label_encoders = {}
+        self.demand_feature_engine = DemandFeatureEngine()
         self.spark.sql(f"CREATE DATABASE IF NOT EXISTS {self.db_name};")
         self.spark.sql(f"""CREATE TABLE IF NOT EXISTS {self.db_name}.raw_sales_data(
         date DATE COMMENT 'Sales transaction date',
@@ -94,6 +96,33 @@ class FeatureEngineer:
         LOG.info(f"✅ Sales history loaded successfully!")
         LOG.info(f"📊 Rows written: {final_df.count():,}")
     
+    def load_sales_history(self):
+        """raw_sales_data as a pandas DataFrame with date, store, item and sales"""
+        return (
+            self.spark.table(f"{self.db_name}.raw_sales_data")
+            .select("date", "store", "item", "sales")
+            .toPandas()
+        )
+
+    def compute_demand_features(self, include_next_day=False):
+        """Lag, rolling and average demand features for every series in raw_sales_data
+
+        include_next_day adds a row for the day after each series' last sale,
+        the lags online prediction reads for the first forecast day.
+        """
+        sales = self.load_sales_history()
+        features = self.demand_feature_engine.fit_transform(sales)
+        if include_next_day:
+            features = pd.concat([features, self.demand_feature_engine.next_day()], ignore_index=True)
+        LOG.info(f"🧮 Computed demand features for {len(features):,} rows")
+        return features
+
+    def update_demand_features(self, new_sales_df):
+        """Features for newly appended days only, reusing the engine's trailing windows"""
+        features = self.demand_feature_engine.update(new_sales_df)
+        LOG.info(f"🧮 Updated demand features for {len(features):,} new rows")
+        return features
+
     def print_data_quality_report(self):
         raw_table = f"{self.db_name}.raw_sales_data"
         df = self.spark.table(raw_table)
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import threading
+import tracemalloc
+from collections import Counter as Tally
+from contextlib import contextmanager
+from datetime import datetime
+from .instrumentation import add_span_listener, remove_span_listener
+from .utils import LOG
+
+
+class StackSampler:
+    """Sampling CPU profiler for one thread.
+
+    A daemon thread reads the target thread's Python stack every ``interval``
+    seconds via sys._current_frames(), so overhead stays flat regardless of how
+    many function calls the pipeline makes (unlike cProfile).
+    """
+
+    def __init__(self, thread_id, interval=0.01, max_depth=128):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Tally()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="pipeline-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def hotspots(self, top=15):
+        """Return [(function, self_samples, total_samples)] ordered by self time"""
+        own, total = Tally(), Tally()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        return [(function, count, total[function]) for function, count in own.most_common(top)]
+
+    def write_collapsed(self, path):
+        """Folded stacks, readable by flamegraph.pl and speedscope"""
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(";".join(stack) + f" {count}\n")
+
+
+class MemoryTracker:
+    """Span listener recording the tracemalloc peak of every pipeline stage.
+
+    Nested stages (e.g. "total" around "train") each get their own peak: the
+    peak counter is reset when a child starts and folded back into the parent
+    when it ends.
+    """
+
+    def __init__(self, top_allocations=10):
+        self.top_allocations = top_allocations
+        self.stages = []
+        self._stack = []
+
+    def on_span_start(self, span):
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._stack.append({"stage": span.stage, "peak": 0})
+
+    def on_span_end(self, span):
+        entry = self._stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(entry["peak"], peak)
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:self.top_allocations]
+        self.stages.append({
+            "stage": span.stage,
+            "duration_s": span.duration,
+            "peak_mb": peak / 1e6,
+            "current_mb": current / 1e6,
+            "top_allocations": [
+                {"location": str(stat.traceback), "size_mb": stat.size / 1e6, "count": stat.count}
+                for stat in stats
+            ],
+        })
+
+
+class ProfileSession:
+    def __init__(self, pipeline, output_dir, interval):
+        self.pipeline = pipeline
+        self.output_dir = output_dir
+        self.sampler = StackSampler(threading.get_ident(), interval=interval)
+        self.memory = MemoryTracker()
+
+    def write(self):
+        """Write the CPU profile, memory report and hotspot summary; returns the hotspots"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.sampler.write_collapsed(os.path.join(self.output_dir, "cpu.collapsed"))
+        with open(os.path.join(self.output_dir, "memory.json"), "w") as f:
+            json.dump(self.memory.stages, f, indent=2)
+
+        hotspots = self.sampler.hotspots()
+        lines = [f"{'self %':>7}{'total %':>9}  function"]
+        for function, own, total in hotspots:
+            lines.append(f"{100 * own / max(self.sampler.samples, 1):>6.1f}%"
+                         f"{100 * total / max(self.sampler.samples, 1):>8.1f}%  {function}")
+        with open(os.path.join(self.output_dir, "hotspots.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return hotspots
+
+    def log_summary(self, hotspots, top=5):
+        LOG.info(f"🔬 Profile of {self.pipeline} pipeline: {self.sampler.samples} samples, artifacts in {self.output_dir}")
+        for function, own, total in hotspots[:top]:
+            LOG.info(f"   🔥 {100 * own / max(self.sampler.samples, 1):5.1f}% self "
+                     f"{100 * total / max(self.sampler.samples, 1):5.1f}% total  {function}")
+        for stage in self.memory.stages:
+            LOG.info(f"   🧠 {stage['stage']}: peak {stage['peak_mb']:.1f} MB in {stage['duration_s']:.2f}s")
+
+    def log(self, tracker, run):
+        """Attach the profile artifacts to a tracked run (used for training runs)"""
+        tracker.log_artifacts(run, self.output_dir, artifact_path="profile")
+
+
+class PipelineProfiler:
+    """Opt-in CPU and memory profiling of pipeline runs.
+
+    Enabled for every run with Config.PROFILE_PIPELINES, or for the next ``runs``
+    runs through ``arm`` (the admin API calls this).
+    """
+
+    def __init__(self, output_dir, enabled=False, interval=0.01):
+        self.output_dir = output_dir
+        self.enabled = enabled
+        self.interval = interval
+        self._armed_runs = 0
+        self._lock = threading.Lock()
+
+    def arm(self, runs=1):
+        with self._lock:
+            self._armed_runs += runs
+        LOG.info(f"Profiling armed for the next {self._armed_runs} pipeline run(s)")
+
+    @property
+    def armed_runs(self):
+        return self._armed_runs
+
+    def _should_profile(self):
+        with self._lock:
+            if self.enabled:
+                return True
+            if self._armed_runs > 0:
+                self._armed_runs -= 1
+                return True
+            return False
+
+    @contextmanager
+    def session(self, pipeline):
+        """Profile the enclosed run if profiling is on; yields the ProfileSession or None"""
+        if not self._should_profile():
+            yield None
+            return
+
+        run_dir = os.path.join(self.output_dir, f"{pipeline}-{datetime.now().strftime('%Y%m%dT%H%M%S')}")
+        session = ProfileSession(pipeline, run_dir, self.interval)
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        add_span_listener(session.memory)
+        session.sampler.start()
+        try:
+            yield session
+        finally:
+            session.sampler.stop()
+            remove_span_listener(session.memory)
+            if started_tracemalloc:
+                tracemalloc.stop()
+            session.log_summary(session.write())
@@ -0,0 +1,185 @@
+import os
+import json
+import uuid
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime, date, timedelta
+from .utils import LOG
+
+logger = logging.getLogger(__name__)
+
+# Order of the last axis of the forecast array
+VALUE_COLUMNS = ["yhat", "yhat_lower", "yhat_upper"]
+CURRENT_POINTER = "CURRENT"
+
+
+class ForecastSnapshot:
+    """One published forecast run, memory-mapped read-only.
+
+    values[series, day_offset] holds (yhat, yhat_lower, yhat_upper) as float32,
+    NaN where a series has no forecast for that day. Series are sorted by
+    (store, item) so every store owns one contiguous row range.
+    """
+
+    def __init__(self, values, index):
+        self.values = values
+        self.run_id = index["run_id"]
+        self.model_version = index["model_version"]
+        self.created_at = datetime.fromisoformat(index["created_at"])
+        self.start_date = date.fromisoformat(index["start_date"])
+        self.horizon = index["horizon"]
+        self.items = np.asarray(index["items"], dtype=np.int64)
+        self.store_rows = {int(store): tuple(rows) for store, rows in index["stores"].items()}
+
+    @property
+    def dates(self):
+        return [self.start_date + timedelta(days=offset) for offset in range(self.horizon)]
+
+    def has_store(self, store):
+        return int(store) in self.store_rows
+
+    def get_store(self, store):
+        """Return (item ids, values[item, day_offset, 3]) for a store, or None if unknown"""
+        rows = self.store_rows.get(int(store))
+        if rows is None:
+            return None
+        start, end = rows
+        return self.items[start:end], self.values[start:end]
+
+
+class ForecastServingStore:
+    """Array-backed forecast store shared by all API workers through the page cache.
+
+    The prediction pipeline publishes every run as two files:
+        forecasts-<run_id>.npy   float32 array [n_series, horizon, 3]
+        forecasts-<run_id>.json  key index (store row ranges, item ids, start date)
+    and then atomically repoints ``CURRENT`` at the new run. Readers reopen the
+    arrays only when ``CURRENT`` changes, so serving never touches the database.
+    """
+
+    def __init__(self, path, keep_versions=2):
+        self.path = path
+        self.keep_versions = keep_versions
+        self._snapshot = None
+        self._pointer_mtime = None
+
+    def _array_path(self, run_id):
+        return os.path.join(self.path, f"forecasts-{run_id}.npy")
+
+    def _index_path(self, run_id):
+        return os.path.join(self.path, f"forecasts-{run_id}.json")
+
+    def _pointer_path(self):
+        return os.path.join(self.path, CURRENT_POINTER)
+
+    def publish(self, predictions, run_id=None):
+        """Build the arrays from a predictions frame and swap them in as the current run.
+
+        Args:
+            predictions: DataFrame with store, item, forecast_date, yhat,
+                yhat_lower, yhat_upper and model_version columns
+            run_id: identifier of the prediction run, generated if not given
+
+        Returns:
+            run_id of the published version
+        """
+        if predictions is None or len(predictions) == 0:
+            LOG.info("No predictions to publish to the serving store")
+            return None
+
+        os.makedirs(self.path, exist_ok=True)
+        run_id = run_id or datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+        df = predictions[["store", "item", "forecast_date"] + VALUE_COLUMNS].copy()
+        df["forecast_date"] = pd.to_datetime(df["forecast_date"]).dt.normalize()
+        df = df.sort_values(["store", "item", "forecast_date"])
+
+        start_date = df["forecast_date"].min()
+        offsets = (df["forecast_date"] - start_date).dt.days.to_numpy()
+        horizon = int(offsets.max()) + 1
+
+        series = df.groupby(["store", "item"], sort=True).ngroup().to_numpy()
+        keys = df[["store", "item"]].drop_duplicates().to_numpy(dtype=np.int64)
+
+        values = np.full((len(keys), horizon, len(VALUE_COLUMNS)), np.nan, dtype=np.float32)
+        values[series, offsets] = df[VALUE_COLUMNS].to_numpy(dtype=np.float32)
+
+        stores, first_rows, counts = np.unique(keys[:, 0], return_index=True, return_counts=True)
+        model_versions = predictions["model_version"].dropna().unique() if "model_version" in predictions else []
+        index = {
+            "run_id": run_id,
+            "model_version": str(model_versions[0]) if len(model_versions) else None,
+            "created_at": datetime.utcnow().isoformat(),
+            "start_date": start_date.date().isoformat(),
+            "horizon": horizon,
+            "items": keys[:, 1].tolist(),
+            "stores": {
+                str(store): [int(first), int(first + count)]
+                for store, first, count in zip(stores, first_rows, counts)
+            },
+        }
+
+        # Write under temporary names, then rename into place so that readers
+        # only ever see complete files.
+        array_path = self._array_path(run_id)
+        with open(array_path + ".tmp", "wb") as f:
+            np.save(f, values)
+        os.replace(array_path + ".tmp", array_path)
+
+        index_path = self._index_path(run_id)
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(index_path + ".tmp", index_path)
+
+        pointer_path = self._pointer_path()
+        with open(pointer_path + ".tmp", "w") as f:
+            f.write(run_id)
+        os.replace(pointer_path + ".tmp", pointer_path)
+
+        LOG.info(f"📦 Published {len(keys):,} series x {horizon} days to serving store (run {run_id})")
+        self._prune(keep=run_id)
+        return run_id
+
+    def _prune(self, keep):
+        """Delete all but the newest ``keep_versions`` runs"""
+        runs = sorted(
+            (name[len("forecasts-"):-len(".json")] for name in os.listdir(self.path)
+             if name.startswith("forecasts-") and name.endswith(".json")),
+            key=lambda run: os.path.getmtime(self._index_path(run)),
+            reverse=True,
+        )
+        for run_id in runs[self.keep_versions:]:
+            if run_id == keep:
+                continue
+            for path in (self._array_path(run_id), self._index_path(run_id)):
+                try:
+                    # Workers that still map an old run keep their pages until they reload
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def current(self):
+        """Return the latest published snapshot, or None if nothing has been published"""
+        try:
+            mtime = os.stat(self._pointer_path()).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        if self._snapshot is not None and mtime == self._pointer_mtime:
+            return self._snapshot
+
+        try:
+            with open(self._pointer_path()) as f:
+                run_id = f.read().strip()
+            with open(self._index_path(run_id)) as f:
+                index = json.load(f)
+            values = np.load(self._array_path(run_id), mmap_mode="r")
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to open serving store run: {e}")
+            return self._snapshot
+
+        self._snapshot = ForecastSnapshot(values, index)
+        self._pointer_mtime = mtime
+        LOG.info(f"Serving forecasts from run {run_id}")
+        return self._snapshot
@@ -0,0 +1,238 @@
+"""Sharded, resumable prediction runs over a durable work queue.
+
+The orchestrator plans a run (stores packed into shards), works on it and
+collects the results. More workers, on this machine or on others sharing
+the queue directory, can join a run with:
+
+    python -m ml_pipeline.sharded_prediction [--run-id RUN_ID]
+
+A run records the model as the orchestrator's local path under MODEL_DIR,
+so workers on other machines need MODEL_DIR on the same shared storage,
+mounted at the same path; a worker that cannot read the model exits
+before claiming any shard.
+"""
+import os
+import uuid
+import time
+import shutil
+import socket
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from pyspark.sql.functions import col, countDistinct
+from .work_queue import WorkQueue, FAILED
+from .budgets import FALLBACK_MODEL_VERSION
+from .instrumentation import SERIES_FAILURES
+from .utils import LOG
+
+PREDICTION_COLUMNS = ["store", "item", "forecast_date", "yhat", "yhat_lower", "yhat_upper", "model_version"]
+
+
+def pack_stores(series_per_store, shard_size):
+    """Group whole stores into shards of about ``shard_size`` series
+
+    Stores are never split, so store-level features (and a later per-store
+    publish) see all items of a store in one shard.
+    """
+    shards, current, size = [], [], 0
+    for store, n_series in series_per_store:
+        if current and size + n_series > shard_size:
+            shards.append(current)
+            current, size = [], 0
+        current.append(int(store))
+        size += n_series
+    if current:
+        shards.append(current)
+    return shards
+
+
+class ShardedPrediction:
+    """Runs DemandPredictor.predict_frame shard by shard with leases.
+
+    Each claimed shard is predicted on the sales of its stores only, and its
+    predictions are committed as one Parquet file before the shard is marked
+    done, so a crash loses at most the shards in flight. Planning a run for a
+    model that already has an unfinished run resumes that run instead.
+    """
+
+    def __init__(self, predictor, path, shard_size=200, lease_seconds=300, max_attempts=3, poll_interval=5.0):
+        self.predictor = predictor
+        self.path = path
+        self.shard_size = shard_size
+        self.poll_interval = poll_interval
+        self.queue = WorkQueue(os.path.join(path, "queue.db"), lease_seconds, max_attempts)
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def _shard_path(self, run_id, shard_id):
+        return os.path.join(self.path, run_id, f"shard-{shard_id:05d}.parquet")
+
+    def plan(self, model_uri, df=None):
+        """Create a run over all stores, or return the unfinished run of the same model"""
+        for run_id in self.queue.unfinished_runs():
+            if self.queue.params(run_id).get("model_uri") == model_uri:
+                LOG.info(f"↩️  Resuming prediction run {run_id}: {self.queue.progress(run_id)}")
+                return run_id
+
+        df = df if df is not None else self.predictor.load_sales()
+        counts = (
+            df.groupBy("store").agg(countDistinct("item").alias("series"))
+            .orderBy("store").toPandas()
+        )
+        shards = pack_stores(zip(counts["store"], counts["series"]), self.shard_size)
+        run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.queue.create_run(run_id, shards, {"model_uri": model_uri, "backend": self.predictor.backend})
+        LOG.info(f"🗂️  Planned prediction run {run_id}: {len(counts)} stores in {len(shards)} shards")
+        return run_id
+
+    @contextmanager
+    def _lease(self, run_id, shard_id):
+        """Renew the shard's lease in the background while it is being predicted"""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.queue.lease_seconds / 3):
+                if not self.queue.renew(run_id, shard_id, self.owner):
+                    LOG.info(f"⚠️  Lost the lease on shard {shard_id} of run {run_id}")
+                    return
+
+        thread = threading.Thread(target=renew, name=f"lease-{shard_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _commit(self, run_id, shard_id, predictions):
+        path = self._shard_path(run_id, shard_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if predictions is None:
+            predictions = pd.DataFrame(columns=PREDICTION_COLUMNS)
+        # Rename into place: a shard file is either complete or absent
+        predictions.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+    def work(self, run_id, df=None, wait=False):
+        """Claim and predict shards until none is left
+
+        Args:
+            wait: keep polling while other workers hold leases, until the run
+                is finished (abandoned shards are taken over when their lease expires)
+
+        Returns:
+            number of shards this worker completed
+        """
+        df = df if df is not None else self.predictor.load_sales()
+        completed = 0
+        while True:
+            claimed = self.queue.claim(run_id, self.owner)
+            if claimed is None:
+                if not wait or self.queue.finished(run_id):
+                    break
+                time.sleep(self.poll_interval)
+                continue
+
+            shard_id, stores = claimed
+            start = time.perf_counter()
+            try:
+                with self._lease(run_id, shard_id):
+                    predictions = self.predictor.predict_frame(df.filter(col("store").isin(stores)))
+                    self._commit(run_id, shard_id, predictions)
+            except Exception as e:
+                SERIES_FAILURES.inc(pipeline="prediction")
+                LOG.info(f"❌ Shard {shard_id} of run {run_id} failed: {e}")
+                self.queue.fail(run_id, shard_id, self.owner, e)
+                continue
+            if self.queue.complete(run_id, shard_id, self.owner):
+                completed += 1
+            progress = self.queue.progress(run_id)
+            LOG.info(f"🧩 Shard {shard_id} ({len(stores)} stores) done in {time.perf_counter() - start:.1f}s, "
+                     f"{progress['done']}/{sum(progress.values())} shards of run {run_id} complete")
+        return completed
+
+    def collect(self, run_id):
+        """Predictions of all completed shards of a finished run"""
+        progress = self.queue.progress(run_id)
+        if progress[FAILED]:
+            LOG.info(f"⚠️  {progress[FAILED]} shards of run {run_id} failed and have no predictions")
+        directory = os.path.join(self.path, run_id)
+        files = sorted(name for name in os.listdir(directory) if name.endswith(".parquet")) \
+            if os.path.isdir(directory) else []
+        frames = [pd.read_parquet(os.path.join(directory, name)) for name in files]
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    def run(self, model_uri, df=None):
+        """Plan (or resume), work until finished and collect: the sharded predict_daily_demand
+
+        Returns:
+            (run_id, predictions)
+        """
+        df = df if df is not None else self.predictor.load_sales()
+        run_id = self.plan(model_uri, df)
+        self.work(run_id, df, wait=True)
+        predictions = self.collect(run_id)
+        if predictions is not None:
+            # The report of the last shard only covers that shard; fallback rows carry their own model_version
+            fallback = predictions.loc[predictions["model_version"] == FALLBACK_MODEL_VERSION, ["store", "item"]]
+            self.predictor.report["fallback_series"] = fallback.drop_duplicates().to_dict("records")
+        self._prune(keep=run_id)
+        return run_id, predictions
+
+    def _prune(self, keep):
+        """Delete the shard files of other finished runs (their predictions are stored by now)"""
+        for name in os.listdir(self.path):
+            directory = os.path.join(self.path, name)
+            if name != keep and os.path.isdir(directory) and self.queue.params(name) is not None \
+                    and self.queue.finished(name):
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+def main(argv=None):
+    from .config import Config
+    from .feast_store import FeastFeatureStore
+    from .predictor import DemandPredictor
+    from .tracking import LoggedModel
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-id", help="Run to work on (default: newest unfinished run)")
+    parser.add_argument("--queue-path", default=Config.PREDICTION_QUEUE_PATH, help="Shared queue directory")
+    args = parser.parse_args(argv)
+
+    predictor = DemandPredictor(
+        Config.MLFLOW_TRACKING_URI,
+        Config.MODEL_NAME,
+        Config.PREDICTIONS_DB_URL,
+        backend=Config.FORECAST_BACKEND,
+        batch_predict=Config.PROPHET_BATCH_PREDICT,
+        interval_mode=Config.INTERVAL_MODE,
+        reduced_samples=Config.INTERVAL_SAMPLES,
+        predict_budget=Config.SERIES_PREDICT_BUDGET_SECONDS,
+        partition_forecasts=Config.FORECAST_PARTITIONED,
+        online_features=Config.XGB_ONLINE_FEATURES,
+        feature_store=FeastFeatureStore(Config.FEAST_REPO_PATH),
+    )
+    sharded = ShardedPrediction(predictor, args.queue_path, Config.PREDICTION_SHARD_SIZE,
+                                Config.PREDICTION_LEASE_SECONDS, Config.PREDICTION_MAX_ATTEMPTS)
+    runs = [args.run_id] if args.run_id else sharded.queue.unfinished_runs()[:1]
+    if not runs:
+        LOG.info("No unfinished prediction runs")
+        return
+    params = sharded.queue.params(runs[0])
+    # The run records which model it predicts with, so every worker loads the same one
+    predictor.backend = params["backend"]
+    if not os.path.exists(params["model_uri"]):
+        raise SystemExit(f"Model {params['model_uri']} of run {runs[0]} is not readable here; "
+                         f"MODEL_DIR must be on storage shared with the orchestrator")
+    if predictor._load_model(LoggedModel(None, params["model_uri"])) is None:
+        raise SystemExit(f"Could not load model {params['model_uri']}")
+    completed = sharded.work(runs[0])
+    LOG.info(f"Worker {sharded.owner} completed {completed} shards of run {runs[0]}")
+
+
+if __name__ == "__main__":
+    main()
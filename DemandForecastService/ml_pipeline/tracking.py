@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import uuid
+import queue
+import tempfile
+import threading
+import urllib.request
+from datetime import datetime
+from .utils import LOG
+
+# MLflow log_batch limits
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+
+
+class TrackedRun:
+    """Handle for a run that the background worker creates later.
+
+    The MLflow run id is only known once the worker has reached the tracking
+    server (or the offline store); ``key`` is known immediately and names
+    local files such as the saved model.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.key = f"{name}-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.run_id = None
+        self.started = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the run exists and return its id (None on timeout)"""
+        self.started.wait(timeout)
+        return self.run_id
+
+
+class LoggedModel:
+    """Result of training: the model is saved locally and uploaded in the background"""
+
+    def __init__(self, run, model_uri):
+        self.run = run
+        self.model_uri = model_uri
+
+    @property
+    def run_id(self):
+        return self.run.run_id
+
+    def __repr__(self):
+        return f"LoggedModel(run={self.run.key}, model_uri={self.model_uri})"
+
+
+class ExperimentTracker:
+    """Buffered MLflow and wandb logging from a background thread.
+
+    Every call only enqueues. A daemon worker connects to the tracking server,
+    coalesces queued params and metrics into log_batch calls and uploads
+    artifacts, so neither a slow server nor an outage sits on the training or
+    startup path. When the server cannot be reached (or ``offline`` is set),
+    runs are written to a local SQLite-backed MLflow store in ``offline_dir`` and wandb
+    runs in offline mode; both can be synced later.
+    """
+
+    def __init__(self, mlflow_uri, experiment_name, wandb_project=None, wandb_api_key=None,
+                 offline_dir="./mlruns-offline", offline=False, connect_timeout=2.0):
+        self.mlflow_uri = mlflow_uri
+        self.experiment_name = experiment_name
+        self.wandb_project = wandb_project
+        self.wandb_api_key = wandb_api_key
+        self.offline_dir = offline_dir
+        self.offline = offline
+        self.connect_timeout = connect_timeout
+        self.client = None
+        self.experiment_id = None
+        self._wandb = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # Producer API: all of these return immediately
+
+    def _put(self, *op):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="experiment-tracker", daemon=True)
+                self._thread.start()
+        self._queue.put(op)
+
+    def start_run(self, name):
+        run = TrackedRun(name)
+        self._put("start", run)
+        return run
+
+    def log_params(self, run, params):
+        self._put("params", run, {name: str(value) for name, value in params.items()})
+
+    def log_metrics(self, run, metrics, step=0):
+        timestamp = int(time.time() * 1000)
+        self._put("metrics", run, [(name, float(value), timestamp, step) for name, value in metrics.items()])
+
+    def log_dict(self, run, data, artifact_file):
+        self._put("dict", run, data, artifact_file)
+
+    def log_artifacts(self, run, local_dir, artifact_path=None):
+        self._put("artifacts", run, local_dir, artifact_path)
+
+    def end_run(self, run, status="FINISHED"):
+        self._put("end", run, status)
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been sent; returns False on timeout"""
+        done = threading.Event()
+        self._put("flush", done)
+        return done.wait(timeout)
+
+    # Worker
+
+    def _server_reachable(self):
+        if not self.mlflow_uri.startswith(("http://", "https://")):
+            return True
+        try:
+            with urllib.request.urlopen(f"{self.mlflow_uri.rstrip('/')}/health", timeout=self.connect_timeout):
+                return True
+        except Exception:
+            return False
+
+    def _connect(self):
+        from mlflow.tracking import MlflowClient
+
+        uri, artifact_location = self.mlflow_uri, None
+        if self.offline or not self._server_reachable():
+            offline_dir = os.path.abspath(self.offline_dir)
+            os.makedirs(offline_dir, exist_ok=True)
+            uri = f"sqlite:///{os.path.join(offline_dir, 'mlflow.db')}"
+            artifact_location = f"file://{os.path.join(offline_dir, 'artifacts')}"
+            self.offline = True
+            LOG.info(f"📴 Experiment tracking offline (server {self.mlflow_uri}), logging to {uri}")
+        self.client = MlflowClient(uri)
+        experiment = self.client.get_experiment_by_name(self.experiment_name)
+        self.experiment_id = experiment.experiment_id if experiment else \
+            self.client.create_experiment(self.experiment_name, artifact_location=artifact_location)
+
+        if self.wandb_project:
+            try:
+                import wandb
+                if self.wandb_api_key and not self.offline:
+                    wandb.login(key=self.wandb_api_key)
+                self._wandb = wandb.init(project=self.wandb_project, name="DemandForecasting",
+                                         mode="offline" if self.offline else None)
+            except Exception as e:
+                LOG.info(f"wandb unavailable, logging to MLflow only: {e}")
+
+    def _work(self):
+        try:
+            self._connect()
+        except Exception as e:
+            LOG.info(f"❌ Experiment tracking disabled, could not connect: {e}")
+            self.client = None
+
+        while True:
+            ops = [self._queue.get()]
+            # Take everything queued meanwhile so params/metrics go out in few batches
+            while True:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._process(ops)
+
+    def _process(self, ops):
+        pending = {}  # run key -> (run, params, metrics), flushed before order-sensitive ops
+
+        def flush_pending():
+            for run, params, metrics in pending.values():
+                self._send_batch(run, params, metrics)
+            pending.clear()
+
+        for op in ops:
+            kind = op[0]
+            if kind in ("params", "metrics"):
+                run = op[1]
+                _, params, metrics = pending.setdefault(run.key, (run, {}, []))
+                if kind == "params":
+                    params.update(op[2])
+                else:
+                    metrics.extend(op[2])
+                continue
+
+            flush_pending()
+            if kind == "flush":
+                op[1].set()
+                continue
+            try:
+                self._apply(op)
+            except Exception as e:
+                LOG.info(f"Experiment tracking '{kind}' failed: {e}")
+            finally:
+                if kind == "start":
+                    op[1].started.set()
+        flush_pending()
+
+    def _apply(self, op):
+        kind, run = op[0], op[1]
+        if self.client is None:
+            return
+        if kind == "start":
+            created = self.client.create_run(self.experiment_id, run_name=run.name)
+            run.run_id = created.info.run_id
+        elif kind == "dict":
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, os.path.basename(op[3]))
+                with open(path, "w") as f:
+                    json.dump(op[2], f, default=str)
+                self.client.log_artifact(run.run_id, path, os.path.dirname(op[3]) or None)
+        elif kind == "artifacts":
+            self.client.log_artifacts(run.run_id, op[2], op[3])
+        elif kind == "end":
+            self.client.set_terminated(run.run_id, op[2])
+
+    def _send_batch(self, run, params, metrics):
+        if self.client is None or run.run_id is None:
+            return
+        from mlflow.entities import Metric, Param
+
+        try:
+            params = [Param(name, value) for name, value in params.items()]
+            metrics = [Metric(*metric) for metric in metrics]
+            for i in range(0, len(params), MAX_PARAMS_PER_BATCH):
+                self.client.log_batch(run.run_id, params=params[i:i + MAX_PARAMS_PER_BATCH])
+            for i in range(0, len(metrics), MAX_METRICS_PER_BATCH):
+                self.client.log_batch(run.run_id, metrics=metrics[i:i + MAX_METRICS_PER_BATCH])
+            if self._wandb is not None:
+                if params:
+                    self._wandb.config.update({p.key: p.value for p in params}, allow_val_change=True)
+                if metrics:
+                    self._wandb.log({f"{run.name}/{m.key}": m.value for m in metrics})
+        except Exception as e:
+            LOG.info(f"Experiment tracking batch for {run.key} failed: {e}")
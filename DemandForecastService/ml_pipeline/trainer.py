@@ -2,78 +2,262 @@ import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 from prophet import Prophet
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 import mlflow
 import mlflow.prophet
-import wandb
 import numpy as np
+import pandas as pd
 import logging
 from .utils import LOG
+from .instrumentation import series_timer
+from .global_forecaster import GlobalXGBForecaster
+from .tuning import ProphetTuner, representative_series, DEFAULT_PARAMS
+from .backtesting import Backtester
+from .intervals import REDUCED_SAMPLES, interval_samples
+from .prophet_batch import ProphetBatchPredictor
+from .model_bundle import write_bundle
+from .tracking import ExperimentTracker, LoggedModel
+from .config import Config
 
 logger = logging.getLogger(__name__)
 
+EXPERIMENT_NAME = "restaurants_demand_forecasting_test_2"
+CONFIDENCE_INTERVAL = 0.95
+
+
+def _create_tracker(mlflow_uri, wandb_project, wandb_api_key):
+    # No network here: the tracker connects from its worker thread on first use
+    return ExperimentTracker(
+        mlflow_uri, EXPERIMENT_NAME, wandb_project, wandb_api_key,
+        offline_dir=Config.TRACKING_OFFLINE_DIR, offline=Config.TRACKING_OFFLINE,
+    )
+
+def _fit_series(keys, frames, params, uncertainty_samples, fit_budget=None):
+    """Fit one Prophet model per series (runs in a worker process)
+
+    Returns:
+        (ProphetBatchPredictor with the fitted parameters, or None if no fit
+        finished; small to send back, unlike the Prophet objects themselves,
+        keys of the series whose fit ran out of time,
+        keys of the series whose fit failed)
+    """
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    logging.getLogger("prophet").setLevel(logging.WARNING)
+    models, timed_out, failed = {}, [], []
+    for key, frame in zip(keys, frames):
+        # Same configuration as ProphetTrainer.train
+        model = Prophet(daily_seasonality=True, weekly_seasonality=True, yearly_seasonality=True,
+                        interval_width=CONFIDENCE_INTERVAL, uncertainty_samples=uncertainty_samples, **params)
+        try:
+            # cmdstanpy terminates the optimizer process after timeout seconds
+            models[key] = model.fit(frame, timeout=fit_budget or None)
+        except TimeoutError:
+            timed_out.append(key)
+        except Exception as e:
+            # One bad series must not take the rest of its chunk down with it
+            logger.warning(f"Fitting series {key} failed: {e}")
+            failed.append(key)
+    return (ProphetBatchPredictor.from_models(models) if models else None), timed_out, failed
+
+
 class ProphetTrainer:
-    def __init__(self, mlflow_uri, wandb_project, wandb_api_key):
+    def __init__(self, mlflow_uri, wandb_project, wandb_api_key, interval_mode="full",
+                 reduced_samples=REDUCED_SAMPLES):
         self.mlflow_uri = mlflow_uri
         self.wandb_project = wandb_project
         self.model = None
+        # Replaced by tune() with the best configuration found
+        self.params = dict(DEFAULT_PARAMS)
+        # How the saved model computes intervals (see intervals.INTERVAL_MODES);
+        # analytic and off models skip Prophet's simulation entirely
+        self.interval_mode = interval_mode
+        self.uncertainty_samples = interval_samples(interval_mode, reduced_samples)
+        self.reduced_samples = reduced_samples
         
-        # Setup MLflow
+        # MLflow + Weights & Biases, logged from a background worker
         mlflow.set_tracking_uri(mlflow_uri)
-        mlflow.set_experiment("restaurants_demand_forecasting_test_2")
-        
-        # Setup Weights & Biases
-        wandb.login(key=wandb_api_key)
-        wandb.init(project=wandb_project, name="DemandForecasting")
+        self.tracker = _create_tracker(mlflow_uri, wandb_project, wandb_api_key)
     
-    def train(self, df):
-        """Train XGBoost model"""
+    def tune(self, sales_df, max_trials=24, max_workers=None, max_series=12):
+        """Search Prophet hyperparameters on representative series; later train() calls use the best ones"""
+        tuner = ProphetTuner(max_trials=max_trials, max_workers=max_workers)
+        series = representative_series(sales_df, max_series=max_series)
+        self.params = tuner.search(series)
+        if tuner.trials:
+            tuner.log(self.tracker, self.params)
+        return self.params
+
+    def train(self, df, backtest_df=None, backtest_folds=3):
+        """Train the Prophet model
+
+        Args:
+            df: Prophet training frame (ds, y)
+            backtest_df: optional sales history (date, store, item, sales); when
+                given, every series is backtested with the same parameters and
+                the accuracy metrics are logged with the model
+        """
         logger.info("Starting model training")
         
-        
-        CONFIDENCE_INTERVAL = 0.95
         # XGBoost parameters
         params = {
             "Daily_seasonality":"True",
             "weekly_seasonality": "True",
             "yearly_seasonality":"True",
             "interval_width" : CONFIDENCE_INTERVAL,
-            "changepoint_prior_scale": 0.05,
-            "seasonality_prior_scale":10.0
-
+            "interval_mode": self.interval_mode,
+            "uncertainty_samples": self.uncertainty_samples,
+            "changepoint_prior_scale": self.params["changepoint_prior_scale"],
+            "seasonality_prior_scale": self.params["seasonality_prior_scale"],
+            "seasonality_mode": self.params["seasonality_mode"],
         }
         # Log parameters
-        wandb.config.update(params)
+        run = self.tracker.start_run("prophet")
+        self.tracker.log_params(run, params)
         
-        with mlflow.start_run():
-            # Train model
-            self.model = Prophet(
-                daily_seasonality=True,
-                weekly_seasonality=True,
-                yearly_seasonality=True,
-                interval_width=CONFIDENCE_INTERVAL,
-                changepoint_prior_scale=0.05,
-                seasonality_prior_scale=10.0
-            )
+        # Train model
+        self.model = Prophet(
+            daily_seasonality=True,
+            weekly_seasonality=True,
+            yearly_seasonality=True,
+            interval_width=CONFIDENCE_INTERVAL,
+            uncertainty_samples=self.uncertainty_samples,
+            changepoint_prior_scale=self.params["changepoint_prior_scale"],
+            seasonality_prior_scale=self.params["seasonality_prior_scale"],
+            seasonality_mode=self.params["seasonality_mode"],
+        )
+        with series_timer("training", "fit"):
             self.model.fit(df)
-            logging.getLogger('prophet').setLevel(logging.WARNING)
-            
-            # Log metrics
-            metrics = {
-            }
-            
-            mlflow.log_params(params)
-            mlflow.log_metrics(metrics)
-            wandb.log(metrics)
-            
-            # Log model
-            model_info = mlflow.prophet.log_model(
-                self.model,
-                # "model",
-                input_example=df[:5],
-                name = "demand_forecast_prophet",
-            )
-            # model_path = mlflow.prophet.save_model(self.model, "./prophet_model")
-            
-            LOG.info(f"Model Trained successfully....")
-            
-            return model_info
\ No newline at end of file
+        logging.getLogger('prophet').setLevel(logging.WARNING)
+        
+        # Log metrics
+        metrics = {
+        }
+        if backtest_df is not None:
+            backtester = Backtester(n_folds=backtest_folds, params=self.params, interval_mode=self.interval_mode,
+                                    reduced_samples=self.reduced_samples)
+            summary, per_series, per_step = backtester.run(backtest_df)
+            if summary:
+                metrics.update({f"backtest_{name}": value for name, value in summary.items()})
+                Backtester.log(self.tracker, run, per_series, per_step)
+        self.tracker.log_metrics(run, metrics)
+        
+        # Save the model locally for the predictor, upload it in the background
+        model_path = os.path.join(Config.MODEL_DIR, run.key)
+        mlflow.prophet.save_model(self.model, model_path, input_example=df[:5])
+        self.tracker.log_artifacts(run, model_path, "demand_forecast_prophet")
+        self.tracker.end_run(run)
+        
+        LOG.info(f"Model Trained successfully....")
+        
+        return LoggedModel(run, model_path)
+
+    def train_series(self, sales_df, min_history_days=90, max_workers=None, chunk_size=16, fit_budget=None):
+        """Fit one Prophet model per store-item series and save them as one model bundle
+
+        Args:
+            sales_df: sales history with date, store, item and sales columns
+            min_history_days: series with less history are skipped, as in prediction
+            max_workers: processes fitting series in parallel (default: all cores)
+            chunk_size: series per task
+            fit_budget: seconds the optimizer may spend on one series; series that
+                run out are left out of the bundle, so prediction gives them the
+                seasonal-naive fallback, and are listed in fallback_series.json
+                (as are series whose fit failed)
+
+        Returns:
+            LoggedModel whose model_uri is the bundle directory (see model_bundle)
+        """
+        logger.info("Starting per-series model training")
+        start = time.perf_counter()
+        sales = sales_df[["date", "store", "item", "sales"]].rename(columns={"date": "ds", "sales": "y"})
+        sales["ds"] = pd.to_datetime(sales["ds"])
+        keys, frames = [], []
+        for key, frame in sales.groupby(["store", "item"], sort=True):
+            if len(frame) >= min_history_days:
+                keys.append((int(key[0]), int(key[1])))
+                frames.append(frame[["ds", "y"]].sort_values("ds").drop_duplicates("ds"))
+
+        run = self.tracker.start_run("prophet_series")
+        self.tracker.log_params(run, {**self.params, "interval_mode": self.interval_mode,
+                                      "uncertainty_samples": self.uncertainty_samples,
+                                      "min_history_days": min_history_days, "fit_budget": fit_budget})
+        parts, failed, timed_out = [], [], []
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            futures = [
+                pool.submit(_fit_series, keys[i:i + chunk_size], frames[i:i + chunk_size],
+                            self.params, self.uncertainty_samples, fit_budget)
+                for i in range(0, len(keys), chunk_size)
+            ]
+            for i, future in zip(range(0, len(keys), chunk_size), futures):
+                try:
+                    part, chunk_timed_out, chunk_failed = future.result()
+                except Exception as e:
+                    failed.extend(keys[i:i + chunk_size])
+                    LOG.info(f"❌ Fitting series {keys[i]} to {keys[min(i + chunk_size, len(keys)) - 1]} failed: {e}")
+                    continue
+                if part is not None:
+                    parts.append(part)
+                timed_out.extend(chunk_timed_out)
+                failed.extend(chunk_failed)
+        if timed_out:
+            LOG.info(f"⏱️  {len(timed_out)} series exceeded the fit budget of {fit_budget}s, "
+                     f"they will be predicted with the seasonal naive fallback")
+        if failed:
+            LOG.info(f"❌ {len(failed)} series could not be fitted, "
+                     f"they will be predicted with the seasonal naive fallback")
+        if timed_out or failed:
+            self.tracker.log_dict(run, {"fit_budget": fit_budget,
+                                        "timed_out_series": [list(key) for key in timed_out],
+                                        "failed_series": [list(key) for key in failed]},
+                                  "fallback_series.json")
+        if not parts:
+            self.tracker.end_run(run, status="FAILED")
+            raise ValueError("No series could be fitted")
+
+        predictor = ProphetBatchPredictor.concat(parts)
+        model_path = os.path.join(Config.MODEL_DIR, run.key)
+        bundle_bytes = write_bundle(predictor, model_path)
+        metrics = {"series": len(predictor.series), "failed_series": len(failed), "timed_out_series": len(timed_out),
+                   "fit_seconds": time.perf_counter() - start, "bundle_bytes": bundle_bytes}
+        self.tracker.log_metrics(run, metrics)
+        # The whole fleet is one artifact, not one MLflow model per series
+        self.tracker.log_artifacts(run, model_path, "demand_forecast_bundle")
+        self.tracker.end_run(run)
+        LOG.info(f"Trained {metrics['series']} series models in {metrics['fit_seconds']:.1f}s")
+        return LoggedModel(run, model_path)
+
+
+class GlobalXGBTrainer:
+    """Trains one XGBoost model across every store-item series (see GlobalXGBForecaster)"""
+
+    def __init__(self, mlflow_uri, wandb_project, wandb_api_key, params=None):
+        self.mlflow_uri = mlflow_uri
+        self.wandb_project = wandb_project
+        self.params = params
+        self.model = None
+
+        mlflow.set_tracking_uri(mlflow_uri)
+        self.tracker = _create_tracker(mlflow_uri, wandb_project, wandb_api_key)
+
+    def train(self, sales_df):
+        """Train on the full sales history (date, store, item, sales) of all series"""
+        logger.info("Starting global XGBoost training")
+        forecaster = GlobalXGBForecaster(params=self.params)
+        run = self.tracker.start_run("global_xgb")
+        self.tracker.log_params(run, forecaster.params)
+
+        with series_timer("training", "fit"):
+            forecaster.fit(sales_df)
+        self.model = forecaster
+        self.tracker.log_metrics(run, forecaster.metrics)
+
+        # Booster plus encoders and interval residuals, saved locally and uploaded in the background
+        model_path = os.path.join(Config.MODEL_DIR, run.key)
+        forecaster.save(model_path)
+        self.tracker.log_artifacts(run, model_path, "global_xgb")
+        self.tracker.end_run(run)
+
+        LOG.info(f"Global XGBoost model trained successfully....")
+        return LoggedModel(run, model_path)
@@ -0,0 +1,171 @@
+import os
+import time
+import random
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from .utils import LOG
+
+# Prophet settings that ProphetTrainer.train used to hardcode
+DEFAULT_PARAMS = {"changepoint_prior_scale": 0.05, "seasonality_prior_scale": 10.0,
+                  "seasonality_mode": "additive"}
+
+SEARCH_SPACE = {
+    "changepoint_prior_scale": [0.001, 0.01, 0.05, 0.1, 0.5],
+    "seasonality_prior_scale": [0.01, 0.1, 1.0, 10.0],
+    "seasonality_mode": ["additive", "multiplicative"],
+}
+
+
+def _evaluate(params, series, horizon):
+    """Holdout MAE of one configuration on a batch of series (runs in a worker process)
+
+    Args:
+        params: Prophet keyword arguments
+        series: list of DataFrames with ds and y, oldest first
+        horizon: days held out at the end of each series
+
+    Returns:
+        list of MAEs, one per series
+    """
+    from prophet import Prophet
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    logging.getLogger("prophet").setLevel(logging.WARNING)
+
+    errors = []
+    for df in series:
+        train, holdout = df.iloc[:-horizon], df.iloc[-horizon:]
+        # Same seasonalities as ProphetTrainer.train
+        model = Prophet(daily_seasonality=True, weekly_seasonality=True, yearly_seasonality=True, **params)
+        model.fit(train)
+        forecast = model.predict(holdout[["ds"]])
+        errors.append(float(np.mean(np.abs(holdout["y"].to_numpy() - forecast["yhat"].to_numpy()))))
+    return errors
+
+
+def representative_series(sales_df, max_series=12, min_days=90, seed=42):
+    """Pick series spread over the sales volume distribution (quiet to busy)
+
+    Returns:
+        list of Prophet-ready DataFrames (ds, y)
+    """
+    sales = sales_df[["date", "store", "item", "sales"]].copy()
+    sales["date"] = pd.to_datetime(sales["date"])
+    stats = sales.groupby(["store", "item"])["sales"].agg(["mean", "count"])
+    stats = stats[stats["count"] >= min_days].sort_values("mean")
+    if stats.empty:
+        return []
+    # Evenly spaced volume quantiles, so tuning does not only see one kind of series
+    positions = np.unique(np.linspace(0, len(stats) - 1, min(max_series, len(stats))).round().astype(int))
+    chosen = stats.index[positions]
+    rng = random.Random(seed)
+    chosen = rng.sample(list(chosen), len(chosen))
+
+    grouped = sales.set_index(["store", "item"]).sort_index()
+    return [
+        grouped.loc[key, ["date", "sales"]].rename(columns={"date": "ds", "sales": "y"})
+        .sort_values("ds").reset_index(drop=True)
+        for key in chosen
+    ]
+
+
+class ProphetTuner:
+    """Successive-halving search over Prophet hyperparameters in a process pool.
+
+    Every candidate is first scored on a small batch of representative
+    series; only the best 1/``reduction_factor`` go on to the next rung, which
+    adds more series. Poor configurations are pruned after a few cheap fits
+    instead of being fitted on every series. Trials are logged as one tracked
+    run with batched metrics, not one run per trial.
+    """
+
+    def __init__(self, max_trials=24, max_workers=None, horizon=15, reduction_factor=3,
+                 search_space=SEARCH_SPACE, seed=42):
+        self.max_trials = max_trials
+        self.max_workers = max_workers or os.cpu_count()
+        self.horizon = horizon
+        self.reduction_factor = reduction_factor
+        self.search_space = search_space
+        self.seed = seed
+        self.trials = []
+        # Surviving trial of the last search, the one whose parameters were returned
+        self.best = None
+
+    def candidates(self):
+        grid = [dict(zip(self.search_space, values)) for values in itertools.product(*self.search_space.values())]
+        rng = random.Random(self.seed)
+        sampled = rng.sample(grid, min(self.max_trials, len(grid)))
+        # Always compare against the current defaults
+        if DEFAULT_PARAMS not in sampled:
+            sampled[-1] = dict(DEFAULT_PARAMS)
+        return sampled
+
+    def _rungs(self, n_series, n_candidates):
+        """Series batch sizes per rung; the batches add up to all series"""
+        rungs = max(1, int(np.ceil(np.log(max(n_candidates, 1)) / np.log(self.reduction_factor))))
+        edges = np.unique(np.linspace(0, n_series, rungs + 1).round().astype(int))
+        return list(zip(edges[:-1], edges[1:]))
+
+    def search(self, series):
+        """Run the search and return the best parameters
+
+        Args:
+            series: Prophet DataFrames from representative_series
+        """
+        if not series:
+            LOG.info("⚠️  No series with enough history to tune on, keeping default parameters")
+            return dict(DEFAULT_PARAMS)
+
+        start = time.perf_counter()
+        self.trials = [{"trial": i, "params": params, "errors": [], "pruned_at_rung": None}
+                       for i, params in enumerate(self.candidates())]
+        alive = list(self.trials)
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            rungs = self._rungs(len(series), len(alive))
+            for rung, (lo, hi) in enumerate(rungs):
+                batch = series[lo:hi]
+                # One task per (trial, series) keeps every worker busy even with few survivors
+                futures = [
+                    (trial, pool.submit(_evaluate, trial["params"], [df], self.horizon))
+                    for trial in alive for df in batch
+                ]
+                for trial, future in futures:
+                    try:
+                        trial["errors"].extend(future.result())
+                    except Exception as e:
+                        trial["errors"].append(float("inf"))
+                        LOG.info(f"Trial {trial['trial']} failed: {e}")
+
+                alive.sort(key=lambda trial: np.mean(trial["errors"]))
+                if rung < len(rungs) - 1:
+                    keep = max(1, len(alive) // self.reduction_factor)
+                    for trial in alive[keep:]:
+                        trial["pruned_at_rung"] = rung
+                    alive = alive[:keep]
+                LOG.info(f"🎛️  Tuning rung {rung}: {len(batch)} series, {len(alive)} configurations left")
+
+        for trial in self.trials:
+            trial["mae"] = float(np.mean(trial["errors"]))
+            trial["series_evaluated"] = len(trial["errors"])
+        best = self.best = alive[0]
+        self.duration = time.perf_counter() - start
+        LOG.info(f"🏆 Best Prophet parameters {best['params']} (MAE {best['mae']:.3f}) "
+                 f"from {len(self.trials)} trials in {self.duration:.1f}s")
+        return dict(best["params"])
+
+    def log(self, tracker, best_params):
+        """Log all trials as one tracked run: per-trial metrics stepped by trial plus a trials table"""
+        run = tracker.start_run("prophet_tuning")
+        tracker.log_params(run, {f"best_{name}": value for name, value in best_params.items()})
+        for trial in self.trials:
+            tracker.log_metrics(run, {"trial_mae": trial["mae"], "trial_series_evaluated": trial["series_evaluated"]},
+                                step=trial["trial"])
+        # Pruned trials were scored on fewer and different series, so the selected trial's MAE, not the lowest one
+        tracker.log_metrics(run, {"best_mae": self.best["mae"], "tuning_seconds": self.duration})
+        tracker.log_dict(run, [{k: v for k, v in trial.items() if k != "errors"} for trial in self.trials],
+                         "tuning/trials.json")
+        tracker.end_run(run)
+        return run
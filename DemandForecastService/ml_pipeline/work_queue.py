@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    params TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    run_id TEXT NOT NULL,
+    shard_id INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, shard_id)
+);
+CREATE INDEX IF NOT EXISTS shards_by_status ON shards (run_id, status);
+"""
+
+
+class WorkQueue:
+    """Durable work queue with leases in a SQLite file.
+
+    A run is a fixed set of shards. Workers (threads, processes, or nodes
+    sharing the file) claim a shard with a lease, renew it while working and
+    mark it done when its output is committed. A shard whose lease expires,
+    because its worker died, is handed to the next worker that asks, so an
+    interrupted run resumes where it stopped. Shards that fail
+    ``max_attempts`` times are marked failed instead of retried forever.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers can
+        # never claim the same shard
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def create_run(self, run_id, payloads, params=None):
+        """Add a run with one shard per payload (JSON-serializable); no-op if it exists"""
+        now = time.time()
+        with self._transaction() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, created_at, params) VALUES (?, ?, ?)",
+                (run_id, now, json.dumps(params or {})),
+            ).rowcount
+            if inserted:
+                conn.executemany(
+                    "INSERT INTO shards (run_id, shard_id, payload, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    [(run_id, shard_id, json.dumps(payload), PENDING, now)
+                     for shard_id, payload in enumerate(payloads)],
+                )
+        return bool(inserted)
+
+    def params(self, run_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT params FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def unfinished_runs(self):
+        """Run ids with shards not yet done or failed, newest first"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT runs.run_id FROM runs JOIN shards USING (run_id) "
+                "WHERE shards.status IN (?, ?) GROUP BY runs.run_id ORDER BY MAX(runs.created_at) DESC",
+                (PENDING, LEASED),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim(self, run_id, owner):
+        """Lease the next pending (or abandoned) shard
+
+        Returns:
+            (shard_id, payload), or None when nothing is claimable right now
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            # Abandoned leases that used up their attempts are failed, not reclaimed
+            conn.execute(
+                "UPDATE shards SET status = ?, error = 'lease expired', updated_at = ? "
+                "WHERE run_id = ? AND status = ? AND lease_expires < ? AND attempts >= ?",
+                (FAILED, now, run_id, LEASED, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT shard_id, payload FROM shards WHERE run_id = ? "
+                "AND (status = ? OR (status = ? AND lease_expires < ?)) ORDER BY shard_id LIMIT 1",
+                (run_id, PENDING, LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE shards SET status = ?, owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE run_id = ? AND shard_id = ?",
+                (LEASED, owner, now + self.lease_seconds, now, run_id, row[0]),
+            )
+        return row[0], json.loads(row[1])
+
+    def renew(self, run_id, shard_id, owner):
+        """Extend a lease; False if the shard was taken over by another worker"""
+        now = time.time()
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE shards SET lease_expires = ?, updated_at = ? "
+                "WHERE run_id = ? AND shard_id = ? AND owner = ? AND status = ?",
+                (now + self.lease_seconds, now, run_id, shard_id, owner, LEASED),
+            ).rowcount
+        return bool(updated)
+
+    def complete(self, run_id, shard_id, owner):
+        """Mark a leased shard done; call after its output has been committed"""
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE shards SET status = ?, lease_expires = NULL, error = NULL, updated_at = ? "
+                "WHERE run_id = ? AND shard_id = ? AND owner = ? AND status = ?",
+                (DONE, time.time(), run_id, shard_id, owner, LEASED),
+            ).rowcount
+        return bool(updated)
+
+    def fail(self, run_id, shard_id, owner, error):
+        """Release a shard after an error: back to pending, or failed after max_attempts"""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE shards SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "lease_expires = NULL, error = ?, updated_at = ? "
+                "WHERE run_id = ? AND shard_id = ? AND owner = ? AND status = ?",
+                (self.max_attempts, FAILED, PENDING, str(error), time.time(), run_id, shard_id, owner, LEASED),
+            )
+
+    def progress(self, run_id):
+        """Shard counts by status"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT status, COUNT(*) FROM shards WHERE run_id = ? GROUP BY status", (run_id,)
+            ).fetchall()
+        return {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def finished(self, run_id):
+        counts = self.progress(run_id)
+        return counts[PENDING] == 0 and counts[LEASED] == 0